@@ -52,7 +52,7 @@ def _json_response(
 ) -> Tuple[int, List[Tuple[str, str]], bytes]:
     hdrs = [("Content-Type", "application/json"), *CORS.items()]
     body = payload if isinstance(payload, str) else json.dumps(
-        payload, ensure_ascii=False
+        payload, ensure_ascii=False, separators=(",", ":")
     )
     return status, hdrs, body.encode()
 
@@ -80,7 +80,7 @@ class handler(BaseHTTPRequestHandler):  # pylint: disable=invalid-name
 
         try:
             length = int(self.headers.get("Content-Length", "0"))
-            env = json.loads(self.rfile.read(length) or "{}")
+            env = json.loads(self.rfile.read(length) or b"{}")
         except Exception:
             self._send(*_json_response(400, {"error": "invalid JSON"}))
             return
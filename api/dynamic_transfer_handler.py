@@ -10,7 +10,11 @@ import json
 import os
 import re
 import sys
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Any, Dict, Tuple
 
 from dotenv import load_dotenv
@@ -26,11 +30,21 @@ def _log(*msg):
         print(*msg, file=sys.stderr, flush=True)
 
 
-COLL = (
-    MongoClient(os.environ["MONGODB_URI"], tz_aware=True)
-    [os.getenv("DB_NAME", "JefferiesJames")]
-    [os.getenv("COLLECTION_NAME", "properties")]
+_MONGO = MongoClient(
+    os.environ["MONGODB_URI"],
+    tz_aware=True,
+    maxPoolSize=10,
+    minPoolSize=2,
+    serverSelectionTimeoutMS=3000,
+    connectTimeoutMS=3000,
 )
+COLL = _MONGO[os.getenv("DB_NAME", "JefferiesJames")][os.getenv("COLLECTION_NAME", "properties")]
+
+# warm the pool on cold start so the first transfer doesn't pay TLS + auth
+try:
+    _MONGO.admin.command("ping")
+except Exception as exc:
+    _log("mongo warmup failed:", exc)
 
 DIAL_CODE = os.getenv("COUNTRY_DIAL_CODE", "+44")
 FALLBACK_NUMBER = os.getenv("FALLBACK_NUMBER")
@@ -39,16 +53,38 @@ CLI_DEFAULT = os.getenv("DEFAULT_CALLER_ID", "")
 # ── helpers ──────────────────────────────────────────────────────────
 
 
+_COMPACT = (",", ":")  # no padding in wire JSON
+
+
 def _json(code: int, payload: Dict[str, Any] | str) -> Tuple[int, list, bytes]:
     return code, [("Content-Type", "application/json")], (
-        payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        payload.encode() if isinstance(payload, str) else json.dumps(payload, separators=_COMPACT).encode()
     )
 
 
+# fixed replies, encoded once
+_IGNORED = _json(200, {})
+_INVALID_JSON = _json(200, {"error": "invalid JSON"})
+_MISSING_LISTING = _json(200, {"error": "missing listing_id"})
+
+# same plan for every transfer; shared, never mutated
+_TRANSFER_PLAN = {
+    "mode": "warm-transfer-experimental",
+    "fallbackPlan": {"message": "The agent did not answer.", "endCallEnabled": False},
+}
+
+
+_NON_DIAL_RE = re.compile(r"[^\d+]")
+
+
+@lru_cache(maxsize=2048)
 def _norm(num: str | None) -> str | None:
     if not num:
         return None
-    num = re.sub(r"[^\d+]", "", num)
+    # already E.164 (the common case) – skip the regex pass
+    if num[0] == "+" and num[1:].isascii() and num[1:].isdigit():
+        return num
+    num = _NON_DIAL_RE.sub("", num)
     if num.startswith("+"):
         return num
     if num.startswith("0"):
@@ -57,23 +93,69 @@ def _norm(num: str | None) -> str | None:
         return "+" + num
     return None
 
+
+FALLBACK_E164 = _norm(FALLBACK_NUMBER)  # constant – normalise once
+
+
+# listing → first agent; repeat transfers for the same listing skip Mongo
+LISTING_TTL = float(os.getenv("LISTING_CACHE_TTL", "300"))
+LISTING_MISS_TTL = 30.0
+_LISTING_CACHE_MAX = 4096
+_LISTING_CACHE: "OrderedDict[Any, Tuple[float, dict]]" = OrderedDict()
+_LISTING_LOCK = threading.Lock()
+# only the agent fields the destination needs; built once, _id left off the wire
+_AGENT_FIELDS = ("name", "phone_mobile", "phone_direct")
+_AGENT_PROJ = {"_id": 0, **{f"agents.{f}": 1 for f in _AGENT_FIELDS}}
+
+
+def _fetch_agent(listing_id: Any) -> Tuple[bool, dict]:
+    # no hint: a hint applies to the whole $or and would stop the planner
+    # using _id_ for one branch and id_idx for the other
+    rec = COLL.find_one(
+        {"$or": [{"_id": listing_id}, {"id": listing_id}]}, _AGENT_PROJ)
+    first = ((rec.get("agents") or [{}])[0] if rec else None) or {}
+    return bool(rec), {f: first.get(f) for f in _AGENT_FIELDS if first.get(f)}
+
+
+def _agent_for(listing_id: Any) -> dict:
+    # listing_id is caller JSON; lists/objects aren't hashable, and bools
+    # would share a key with 1/0 – look those up uncached
+    if isinstance(listing_id, bool) or not isinstance(listing_id, (str, int)):
+        return _fetch_agent(listing_id)[1]
+    now = time.monotonic()
+    with _LISTING_LOCK:
+        hit = _LISTING_CACHE.get(listing_id)
+        if hit and hit[0] > now:
+            _LISTING_CACHE.move_to_end(listing_id)
+            return hit[1]
+    found, agent = _fetch_agent(listing_id)
+    ttl = LISTING_TTL if found else LISTING_MISS_TTL
+    with _LISTING_LOCK:
+        _LISTING_CACHE[listing_id] = (now + ttl, agent)
+        _LISTING_CACHE.move_to_end(listing_id)
+        while len(_LISTING_CACHE) > _LISTING_CACHE_MAX:
+            _LISTING_CACHE.popitem(last=False)
+    return agent
+
 # ── HTTP handler ─────────────────────────────────────────────────────
 
 
 class handler(BaseHTTPRequestHandler):  # noqa: N801
+    wbufsize = -1  # buffer status line + headers + body into one write
+
     def log_message(self, *_):  # silence default
         return
 
     def do_POST(self):
         try:
-            raw = self.rfile.read(
-                int(self.headers.get("Content-Length", "0")) or 0)
-            evt = json.loads(raw or "{}")
+            clen = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(clen)
+            evt = json.loads(raw or b"{}")
         except Exception:
-            return self._send(*_json(200, {"error": "invalid JSON"}))
+            return self._send(*_INVALID_JSON)
 
         if evt.get("type") != "transfer-destination-request":
-            return self._send(*_json(200, {}))  # ignore everything else
+            return self._send(*_IGNORED)  # ignore everything else
 
         self._send(*self._handle_transfer(evt))
 
@@ -91,15 +173,13 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
         _log("listing_id:", listing_id)
 
         if not listing_id:
-            return _json(200, {"error": "missing listing_id"})
+            return _MISSING_LISTING
 
-        rec = COLL.find_one({"_id": listing_id}) or COLL.find_one(
-            {"id": listing_id})
-        agent = (rec.get("agents") or [{}])[0] if rec else {}
+        agent = _agent_for(listing_id)
 
-        phones = [agent.get("phone_mobile"), agent.get(
-            "phone_direct"), FALLBACK_NUMBER]
-        number = next((n for n in (_norm(p) for p in phones) if n), None)
+        number = (_norm(agent.get("phone_mobile"))
+                  or _norm(agent.get("phone_direct"))
+                  or FALLBACK_E164)
         _log("dial:", number or "—")
 
         if not number:
@@ -111,10 +191,7 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
             "message": f"Connecting you to {agent.get('name', 'our negotiator')}.",
             "callerId": evt.get("phoneNumber", CLI_DEFAULT),
             "numberE164CheckEnabled": True,
-            "transferPlan": {
-                "mode": "warm-transfer-experimental",
-                "fallbackPlan": {"message": "The agent did not answer.", "endCallEnabled": False},
-            },
+            "transferPlan": _TRANSFER_PLAN,
         }
         return _json(200, {"destination": dest})
 
@@ -123,12 +200,14 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
         self.send_response(code)
         for k, v in hdrs:
             self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
         self.wfile.write(body)
+        self.wfile.flush()
 
 
 # ── local smoke-test ─────────────────────────────────────────────────
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     _log(f"★ listening on http://0.0.0.0:{port}")
-    HTTPServer(("", port), handler).serve_forever()
+    ThreadingHTTPServer(("", port), handler).serve_forever()
@@ -40,12 +40,13 @@ import sys
 from collections import defaultdict
 from datetime import datetime, timezone
 from decimal import Decimal
+from functools import lru_cache
 from typing import Any, Dict, Generator, List, Tuple
 
 import httpx
 from dotenv import load_dotenv
 from http.server import BaseHTTPRequestHandler
-from pymongo import ASCENDING, TEXT, MongoClient, UpdateOne
+from pymongo import ASCENDING, MongoClient, UpdateOne
 from pymongo.errors import OperationFailure
 
 # ── env & logging ────────────────────────────────────────────────
@@ -134,8 +135,11 @@ _SUBCAT_DICT = {
 }
 _SUB_LOOKUP = {syn.lower(): canon for canon, syns in _SUBCAT_DICT.items()
                for syn in syns}
+# canonical names map to themselves, as in lib.property_search._LOOKUP
+_SUB_LOOKUP.update({canon: canon for canon in _SUBCAT_DICT})
 
 
+@lru_cache(maxsize=4096)
 def normalise_subcategory_value(s: str | None) -> str | None:
     if not s:
         return None
@@ -201,11 +205,15 @@ def to_int(x: Any) -> int | None:
             return None
 
 
+_NON_NUMERIC_RE = re.compile(r"[^0-9.]")
+_OFFERS_OVER_RE = re.compile(r"\boffers?\s*over\b|\boieo\b|\boiro\b")
+
+
 def to_float_stripped(x: Any) -> float | None:
     if x in (None, "", "null"):
         return None
     s = str(x)
-    s = re.sub(r"[^0-9.]", "", s)
+    s = _NON_NUMERIC_RE.sub("", s)
     try:
         return float(s) if s else None
     except Exception:
@@ -243,7 +251,7 @@ def classify_price_text(text: str | None) -> str:
     if not text:
         return "unknown"
     t = text.lower()
-    if re.search(r"\boffers?\s*over\b|\boieo\b|\boiro\b", t):
+    if _OFFERS_OVER_RE.search(t):
         return "offers_over"
     if "guide" in t:
         return "guide"
@@ -293,34 +301,15 @@ def ensure_indexes():
     except OperationFailure as exc:
         if exc.code != 85:  # 85 IndexOptionsConflict
             raise
-    # text index for keyword search
-    text_keys = [
-        ("address.formats.full_address", TEXT),
-        ("address.locality", TEXT),
-        ("address.suburb_or_town", TEXT),
-        ("advert_internet.heading", TEXT),
-        ("advert_internet.body", TEXT),
-        ("advert_brochure.heading", TEXT),
-        ("advert_brochure.body", TEXT),
-        ("advert_stocklist.heading", TEXT),
-        ("advert_stocklist.body", TEXT),
-        ("highlights.description", TEXT),
-        ("features", TEXT),
-        ("location_terms", TEXT),
-    ]
+    # listing-id lookups from the transfer handlers ($or on _id / id)
     try:
-        col_prop.create_index(text_keys, name="text_search",
-                              default_language="english", background=True)
+        col_prop.create_index([("id", ASCENDING)], name="id_idx", background=True)
     except OperationFailure as exc:
-        if exc.code == 85:
-            try:
-                col_prop.drop_index("text_search")
-            except Exception:
-                pass
-            col_prop.create_index(
-                text_keys, name="text_search", default_language="english", background=True)
-        else:
+        if exc.code != 85:  # already indexed under another name (e.g. id_1)
             raise
+    # the "text_search" index is owned by lib/property_search.py
+    # (_TEXT_WEIGHTS), which creates it and rebuilds it with --reindex;
+    # building a second spec here would replace it on every run
 
 # ── flattener ────────────────────────────────────────────────────
 
@@ -487,6 +476,9 @@ def flatten(row: dict) -> dict:
         "advert_internet": row.get("advert_internet", {}) or {},
         "advert_brochure": row.get("advert_brochure", {}) or {},
         "advert_stocklist": row.get("advert_stocklist", {}) or {},
+        # beds/baths hardened to ints (filterable without string variants)
+        "beds_int": beds_int,
+        "baths_int": baths_int,
         # attributes for downstream UI
         "attributes": attrs,
         "attributes_full": attrs,
@@ -7,11 +7,19 @@ import os
 import re
 import hmac
 import hashlib
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from email.message import Message
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Any, Dict, Optional
 
 VAPI_SECRET = os.getenv("VAPI_SECRET", "")
+VAPI_SECRET_BYTES = VAPI_SECRET.encode()
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_SECRET_BYTES = WEBHOOK_SECRET.encode()
+# keyed once; copied per request
+_HMAC_TMPL = hmac.new(WEBHOOK_SECRET_BYTES, digestmod=hashlib.sha256) \
+    if WEBHOOK_SECRET_BYTES else None
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", "262144"))  # 256 KiB
 COUNTRY_DIAL_CODE = os.getenv("COUNTRY_DIAL_CODE", "+44")
 OUTBOUND_CLI = os.getenv("OUTBOUND_CLI", os.getenv("DEFAULT_CALLER_ID", ""))
 
@@ -30,14 +38,41 @@ ALIASES = _load_json_env("ALIASES_JSON")
 PREFERENCES = _load_json_env("PREFERENCES_JSON")   # optional per-target tweaks
 
 
+_COMPACT = (",", ":")  # no padding in wire JSON
+
+
 def _json(code: int, payload: Dict[str, Any]) -> tuple[int, list[tuple[str, str]], bytes]:
-    return code, [("Content-Type", "application/json")], json.dumps(payload).encode()
+    return code, [("Content-Type", "application/json")], json.dumps(payload, separators=_COMPACT).encode()
+
+
+# fixed replies, encoded once
+_ACK = _json(200, {"success": True})
+_UNAUTHENTICATED = _json(401, {"error": "unauthenticated"})
+_INVALID_JSON = _json(400, {"error": "invalid JSON"})
+_BAD_LENGTH = _json(400, {"error": "invalid Content-Length"})
+_TOO_LARGE = _json(413, {"error": "payload too large"})
+
+
+# static parts of the warm transfer plan; shared, never mutated
+_SUMMARY_SYSTEM_MSG = {"role": "system",
+                       "content": "Provide a concise summary of the call."}
+_FALLBACK_PLAN = {
+    "message": "Could not complete the transfer. I’m still here.",
+    "endCallEnabled": False,
+}
 
 
+_NON_DIAL_RE = re.compile(r"[^\d+]")
+
+
+@lru_cache(maxsize=2048)
 def _norm(num: Optional[str]) -> Optional[str]:
     if not num:
         return None
-    s = re.sub(r"[^\d+]", "", num)
+    # already E.164 (the common case) – skip the regex pass
+    if num[0] == "+" and num[1:].isascii() and num[1:].isdigit():
+        return num
+    s = _NON_DIAL_RE.sub("", num)
     if s.startswith("+"):
         return s
     if s.startswith("0"):
@@ -47,17 +82,19 @@ def _norm(num: Optional[str]) -> Optional[str]:
     return None
 
 
-def _signature_ok(raw: bytes, headers: Dict[str, str]) -> bool:
+def _signature_ok(raw: bytes, headers: Message) -> bool:
     sig = headers.get("x-vapi-signature")
-    if WEBHOOK_SECRET and sig:
-        expected = hmac.new(WEBHOOK_SECRET.encode(), raw,
-                            hashlib.sha256).hexdigest()
+    if _HMAC_TMPL is not None and sig:
         try:
-            return hmac.compare_digest(sig, expected)
-        except Exception:
+            want = bytes.fromhex(sig)
+        except ValueError:
             return False
+        mac = _HMAC_TMPL.copy()
+        mac.update(raw)
+        return hmac.compare_digest(mac.digest(), want)
     sec = headers.get("x-vapi-secret") or headers.get("secret")
-    return (not VAPI_SECRET) or (sec == VAPI_SECRET)
+    return (not VAPI_SECRET_BYTES) or hmac.compare_digest(
+        (sec or "").encode(), VAPI_SECRET_BYTES)
 
 
 def _get_args(evt: Dict[str, Any]) -> Dict[str, Any]:
@@ -128,8 +165,7 @@ def _destination_for(target: str, reason: Optional[str], complexity: Optional[st
     if not number:
         return {"error": "no_match", "hint": "unknown target"}
 
-    summary_msgs = [
-        {"role": "system", "content": "Provide a concise summary of the call."}]
+    summary_msgs = [_SUMMARY_SYSTEM_MSG]
     extras = []
     if reason:
         extras.append(f"Reason: {reason}.")
@@ -146,10 +182,7 @@ def _destination_for(target: str, reason: Optional[str], complexity: Optional[st
         "transferPlan": {
             "mode": "warm-transfer-experimental",
             "summaryPlan": {"enabled": True, "messages": summary_msgs},
-            "fallbackPlan": {
-                "message": "Could not complete the transfer. I’m still here.",
-                "endCallEnabled": False
-            }
+            "fallbackPlan": _FALLBACK_PLAN,
         }
     }
     prefs = PREFERENCES.get(target, {})
@@ -159,25 +192,32 @@ def _destination_for(target: str, reason: Optional[str], complexity: Optional[st
 
 
 class handler(BaseHTTPRequestHandler):
+    wbufsize = -1  # buffer status line + headers + body into one write
+
     def log_message(self, *_: Any) -> None:
         return
 
     def do_POST(self) -> None:  # noqa: N802
-        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
-        headers = {k.lower(): v for k, v in self.headers.items()}
-
-        if not _signature_ok(raw, headers):
-            return self._send(*_json(401, {"error": "unauthenticated"}))
+        try:
+            clen = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            clen = -1
+        if clen < 0 or clen > MAX_BODY_BYTES:
+            self.close_connection = True  # unread body would poison keep-alive
+            return self._send(*(_BAD_LENGTH if clen < 0 else _TOO_LARGE))
+        raw = self.rfile.read(clen)
+        if not _signature_ok(raw, self.headers):
+            return self._send(*_UNAUTHENTICATED)
 
         try:
-            data = json.loads(raw or "{}")
+            data = json.loads(raw or b"{}")
         except Exception:
-            return self._send(*_json(400, {"error": "invalid JSON"}))
+            return self._send(*_INVALID_JSON)
 
         evt = data["message"] if isinstance(
             data.get("message"), dict) else data
         if evt.get("type") != "transfer-destination-request":
-            return self._send(*_json(200, {"success": True}))
+            return self._send(*_ACK)
 
         params = _get_args(evt)
         targetName = params.get("targetName")
@@ -198,10 +238,12 @@ class handler(BaseHTTPRequestHandler):
         self.send_response(code)
         for k, v in hdrs:
             self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
         self.wfile.write(body)
+        self.wfile.flush()
 
 
 if __name__ == "__main__":
     print("★ transfer_webhook_min listening on http://0.0.0.0:8000")
-    HTTPServer(("", 8000), handler).serve_forever()
+    ThreadingHTTPServer(("", 8000), handler).serve_forever()
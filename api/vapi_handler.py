@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-from lib.property_search import Settings, PropertyRepository, summarise, send_whatsapp
+from lib.property_search import (SUMMARY_PROJECTION, Settings, PropertyRepository,
+                                 get_repository, get_settings, summarise, send_whatsapp_bulk)
 
 import os
 import sys
+import hmac
 import json
 import logging
-from http.server import BaseHTTPRequestHandler
-from typing import Any, Dict
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
 # add repo root so we can import lib/
@@ -27,12 +30,29 @@ CORS = {
 }
 
 VAPI_SECRET = os.getenv("VAPI_SECRET")
+VAPI_SECRET_BYTES = (VAPI_SECRET or "").encode()
+
+# one Settings + repository per warm instance; built lazily so a Mongo
+# outage doesn't fail the import (GET/OPTIONS keep answering). The
+# repository itself is the process-wide one from lib.property_search.
+_REPO: Optional[Tuple[Settings, PropertyRepository]] = None
+_REPO_LOCK = threading.Lock()
+
+
+def _get_repo() -> Tuple[Settings, PropertyRepository]:
+    global _REPO
+    if _REPO is None:
+        with _REPO_LOCK:
+            if _REPO is None:
+                cfg = get_settings()
+                _REPO = (cfg, get_repository(cfg))
+    return _REPO
 
 
 def _json(code: int, payload: Any) -> tuple[int, list[tuple[str, str]], bytes]:
     headers = [("Content-Type", "application/json"), *CORS.items()]
     body = payload if isinstance(payload, str) else json.dumps(
-        payload, ensure_ascii=False)
+        payload, ensure_ascii=False, separators=(",", ":"))
     return code, headers, body.encode()
 
 
@@ -59,14 +79,16 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
             or self.headers.get("x-vapi-signature")
             or self.headers.get("secret")
         )
-        if VAPI_SECRET and secret != VAPI_SECRET:
+        if VAPI_SECRET_BYTES and not hmac.compare_digest(
+                (secret or "").encode(), VAPI_SECRET_BYTES):
             code, hdrs, body = _json(401, {"error": "unauthenticated"})
             self._send(code, hdrs, body)
             return
 
-        raw = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        clen = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(clen)
         try:
-            data = json.loads(raw or "{}")
+            data = json.loads(raw or b"{}")
         except json.JSONDecodeError:
             code, hdrs, body = _json(400, {"error": "invalid_json"})
             self._send(code, hdrs, body)
@@ -82,8 +104,7 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
 
         tool_calls = evt.get("toolCalls") or evt.get("toolCallList") or []
         try:
-            cfg = Settings.from_env()
-            repo = PropertyRepository(cfg)
+            cfg, repo = _get_repo()
         except Exception as exc:
             code, hdrs, body = _json(
                 500, {"error": "init_failed", "detail": str(exc)})
@@ -91,6 +112,7 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
             return
 
         results: List[dict] = []
+        sends: List[Tuple[str, dict]] = []  # (phone, summary), sent together below
         for call in tool_calls:
             tool_id = call.get("id") or call.get("toolCallId") or "unknown"
             fn = (call.get("function") or {}).get("name")
@@ -105,7 +127,7 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
                 if args.get("location") and not args.get("keyword"):
                     args["keyword"] = args["location"]
 
-                doc, tier, debug = repo.find_best(args)
+                doc, tier, debug = repo.find_best(args, SUMMARY_PROJECTION)
                 if not doc:
                     results.append({"toolCallId": tool_id, "result": {
                                    "no_match": True, "tier": tier, "debug": debug}})
@@ -117,11 +139,7 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
                 phone = args.get("phone_number")
                 dry = bool(args.get("dry", False))
                 if phone and not dry:
-                    try:
-                        send_whatsapp(cfg, phone, out)
-                        out["whatsapp"] = "sent"
-                    except Exception as exc:
-                        out["whatsapp"] = f"failed: {exc}"
+                    sends.append((phone, out))
                 else:
                     out["whatsapp"] = "skipped"
 
@@ -131,6 +149,9 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
                 results.append({"toolCallId": tool_id, "result": {
                                "error": "search_failed", "detail": str(exc)}})
 
+        for (_, out), exc in zip(sends, send_whatsapp_bulk(cfg, sends)):
+            out["whatsapp"] = "sent" if exc is None else f"failed: {exc}"
+
         code, hdrs, body = _json(200, {"results": results})
         self._send(code, hdrs, body)
 
@@ -146,4 +167,4 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", "8000"))
     LOG.info("★ vapi_handler listening on http://0.0.0.0:%s (DEBUG=%s)",
              port, os.getenv("DEBUG") == "1")
-    HTTPServer(("", port), handler).serve_forever()
+    ThreadingHTTPServer(("", port), handler).serve_forever()
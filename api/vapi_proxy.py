@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # api/vapi_proxy.py
 # Vapi ➜ (optional) dynamic resolver ➜ destination JSON
-# Works on Vercel (serverless) and locally (HTTPServer below)
+# Works on Vercel (serverless) and locally (ThreadingHTTPServer below)
+# FORWARD_URL events are forwarded before the ack on Vercel and in the
+# background locally; FORWARD_BACKGROUND=1/0 overrides (see below)
 
 from __future__ import annotations
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import hashlib
 import hmac
@@ -12,12 +14,17 @@ import json
 import logging
 import os
 import re
+import socket
 import sys
+import threading
 import time
 import ssl
-import urllib.request
-from typing import Any, Dict, Optional, Tuple
-from urllib.error import HTTPError, URLError
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.message import Message
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import httpx
 
 # ──────────────────────────────────────────────────────────────────────────────
 # configuration & logging
@@ -26,37 +33,70 @@ from urllib.error import HTTPError, URLError
 DEBUG = os.getenv("DEBUG") == "1"
 
 
-def _ts() -> str:
-    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + f".{int((time.time()%1)*1000):03d}Z"
+class _UTCFormatter(logging.Formatter):
+    converter = time.gmtime
+    default_time_format = "%Y-%m-%dT%H:%M:%S"
+    default_msec_format = "%s.%03dZ"
 
 
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.DEBUG if DEBUG else logging.INFO,
-    format="%(message)s",
-)
+# one stdout handler of our own, so the runtime's root logger config can't
+# swallow or double our lines; it still flushes every record (Vercel's log
+# capture relies on that) – the saving is formatting/encoding only the
+# lines that pass the level check, not in flushing
+_LOG_HANDLER = logging.StreamHandler(sys.stdout)
+_LOG_HANDLER.setFormatter(_UTCFormatter("%(asctime)s | %(levelname)-5s | %(message)s"))
 LOG = logging.getLogger("vapi-proxy")
+LOG.addHandler(_LOG_HANDLER)
+LOG.setLevel(logging.DEBUG if DEBUG else logging.INFO)
+LOG.propagate = False
 
+_LEVELS = {"debug": logging.DEBUG, "info": logging.INFO,
+           "warning": logging.WARNING, "error": logging.ERROR}
 
-def _log(level: str, msg: str, **kv: Any) -> None:
-    parts = [f"{_ts()} | {level.upper():5} | {msg}"]
-    if kv:
+
+class _KV:
+    """key=value tail, JSON-encoded only if the record is actually emitted"""
+    __slots__ = ("kv",)
+
+    def __init__(self, kv: Dict[str, Any]) -> None:
+        self.kv = kv
+
+    def __str__(self) -> str:
+        if not self.kv:
+            return ""
         try:
-            parts.append(
-                "| " + " ".join(f"{k}={json.dumps(v, ensure_ascii=False)}" for k, v in kv.items()))
+            return " | " + " ".join(
+                f"{k}={json.dumps(v, ensure_ascii=False)}" for k, v in self.kv.items())
         except Exception:
-            parts.append("| (kv-encode-failed)")
-    print(" ".join(parts), flush=True)
+            return " | (kv-encode-failed)"
+
+
+def _log(level: str, msg: str, **kv: Any) -> None:
+    lvl = _LEVELS.get(level, logging.INFO)
+    if LOG.isEnabledFor(lvl):
+        LOG.log(lvl, "%s%s", msg, _KV(kv))
 
 
 # env
 VAPI_SECRET = os.getenv("VAPI_SECRET", "")
+VAPI_SECRET_BYTES = VAPI_SECRET.encode()
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", "262144"))  # 256 KiB
 DYN_ENABLED = os.getenv("DYNAMIC_TRANSFER_ENABLED") == "1"
 DYN_URL = os.getenv("DYNAMIC_TRANSFER_URL", "")
 DYN_SECRET = os.getenv("DYNAMIC_TRANSFER_SECRET", VAPI_SECRET)
 
 FORWARD_URL = os.getenv("FORWARD_URL", "")  # optional analytics sink
 FORWARD_RETRY = os.getenv("FORWARD_RETRY", "0") == "1"
+FORWARD_MAX_INFLIGHT = int(os.getenv("FORWARD_MAX_INFLIGHT", "256"))
+FORWARD_WORKERS = int(os.getenv("FORWARD_WORKERS", "8"))
+# Forward on a background thread after acking Vapi (faster ack) or inline
+# before the ack. Off by default on Vercel: a serverless instance can be
+# frozen or recycled once the response is sent, so a forward still queued
+# or running then may be delayed or lost without any log line.
+FORWARD_BACKGROUND = os.getenv(
+    "FORWARD_BACKGROUND", "0" if os.getenv("VERCEL") else "1") == "1"
+# how long a "no destination" answer from the resolver is trusted for the same args
+RESOLVER_MISS_TTL = float(os.getenv("RESOLVER_MISS_TTL", "30"))
 
 DIAL_CODE = os.getenv("COUNTRY_DIAL_CODE", "+44")
 CLI_DEFAULT = os.getenv("DEFAULT_CALLER_ID", "")
@@ -85,19 +125,38 @@ ALIASES = _env_json("ALIASES_JSON")             # "alias" -> "Canonical Name"
 # "Canonical Name" -> {mode, callerId}
 PREFERENCES = _env_json("PREFERENCES_JSON")
 
+
+def _cf_index(d: Dict[str, Any]) -> Dict[str, Tuple[str, Any]]:
+    """casefolded key -> (original key, value); first entry wins, as the old scans did"""
+    out: Dict[str, Tuple[str, Any]] = {}
+    for k, v in d.items():
+        out.setdefault(k.casefold(), (k, v))
+    return out
+
+
+_CONTACTS_CF = _cf_index(CONTACTS)
+_ASSISTANTS_CF = _cf_index(ASSISTANTS)
+_ALIASES_CF = _cf_index(ALIASES)
+
 # ──────────────────────────────────────────────────────────────────────────────
 # helpers
 # ──────────────────────────────────────────────────────────────────────────────
 
 _E164_RE = re.compile(r"^\+\d{6,18}$")
+_NON_DIAL_RE = re.compile(r"[^\d+]")
+_ALPHA_RE = re.compile(r"[A-Za-z]")
 
 
 def _norm_e164(num: Optional[str]) -> Optional[str]:
     """Normalize to E.164. Returns None if impossible."""
     if not num:
         return None
+    s = str(num)
+    # already E.164 (the common case) – skip the regex pass
+    if s[0] == "+" and s[1:].isascii() and s[1:].isdigit():
+        return s if _E164_RE.match(s) else None
     # strip everything except digits and '+'
-    s = re.sub(r"[^\d+]", "", str(num))
+    s = _NON_DIAL_RE.sub("", s)
     if not s:
         return None
     if s.startswith("+"):
@@ -118,96 +177,194 @@ def _safe_json(obj: Any) -> str:
         return "<unserializable>"
 
 
-def _hmac_ok(raw: bytes, signature: str, secret: str) -> bool:
-    if not signature or not secret:
+# keyed once: copy() skips re-deriving the ipad/opad state on every request
+_HMAC_TMPL = hmac.new(VAPI_SECRET_BYTES, digestmod=hashlib.sha256) \
+    if VAPI_SECRET_BYTES else None
+
+
+def _hmac_ok(raw: bytes, signature: str) -> bool:
+    if not signature or _HMAC_TMPL is None:
         return False
     try:
-        mac = hmac.new(secret.encode(), raw, hashlib.sha256).hexdigest()
-        return hmac.compare_digest(mac, signature.lower())
-    except Exception:
+        # non-hex values are rejected here, before hashing the body
+        expected = bytes.fromhex(signature)
+    except ValueError:
         return False
+    mac = _HMAC_TMPL.copy()
+    mac.update(raw)
+    return hmac.compare_digest(mac.digest(), expected)
 
 
-def _auth_ok(headers: dict, raw: bytes) -> Tuple[bool, str]:
+def _auth_ok(headers: Message, raw: bytes) -> Tuple[bool, str]:
     """Allow either x-vapi-secret (plain) OR x-vapi-signature (HMAC SHA256)."""
+    if not VAPI_SECRET_BYTES:
+        return False, "none"
     plain = headers.get("x-vapi-secret") or headers.get("x-vapi-signature")
-    if VAPI_SECRET and plain == VAPI_SECRET:
+    if hmac.compare_digest((plain or "").encode(), VAPI_SECRET_BYTES):
         _log("info", "auth: ok via x-vapi-secret (plain)")
         return True, "plain"
     sig = headers.get("x-vapi-signature", "")
-    if _hmac_ok(raw, sig, VAPI_SECRET):
+    if _hmac_ok(raw, sig):
         _log("info", "auth: ok via x-vapi-signature (hmac)")
         return True, "hmac"
     return False, "none"
 
 
-def _post(url: str, blob: bytes, headers: dict, timeout: float = 10.0) -> Tuple[int, bytes, dict]:
-    req = urllib.request.Request(
-        url, data=blob, headers=headers, method="POST")
+# built once: loading the CA bundle is not free
+_SSL_CTX = ssl.create_default_context()
+
+# one keep-alive pool for resolver + forward calls (saves a TLS handshake per event)
+_HTTP = httpx.Client(
+    verify=_SSL_CTX,
+    timeout=10.0,
+    follow_redirects=False,  # fixed upstreams; never re-POST a body (and x-vapi-secret) elsewhere
+    limits=httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "10")),
+    ),
+)
+
+
+# upstream URLs parsed once instead of on every post
+_DYN_URL = httpx.URL(DYN_URL) if DYN_URL else None
+_FORWARD_URL = httpx.URL(FORWARD_URL) if FORWARD_URL else None
+
+
+def _post(url: httpx.URL, blob: bytes, headers: dict, timeout: float = 10.0) -> Tuple[int, bytes, Mapping[str, str]]:
     t0 = time.perf_counter()
     try:
-        with urllib.request.urlopen(req, context=ssl.create_default_context(), timeout=timeout) as r:
-            body = r.read()
-            dt = int((time.perf_counter() - t0) * 1000)
-            _log("info", "http", url=url, status=r.status,
-                 ms=dt, out_len=len(body))
-            return r.status, body, dict(r.headers)
-    except HTTPError as e:
-        emsg = e.read().decode(errors="ignore")
+        r = _HTTP.post(url, content=blob, headers=headers, timeout=timeout)
+    except httpx.HTTPError as e:
         dt = int((time.perf_counter() - t0) * 1000)
-        _log("warning", "http-error", url=url,
-             status=e.code, ms=dt, error=emsg[:400])
-        return e.code, emsg.encode(), {}
-    except URLError as e:
-        dt = int((time.perf_counter() - t0) * 1000)
-        _log("warning", "http-error", url=url, status=0, ms=dt, error=str(e))
+        _log("warning", "http-error", url=str(url), status=0, ms=dt, error=str(e))
         return 0, b"", {}
-
-
-def _forward_elsewhere(raw: bytes, headers: dict) -> None:
+    body = r.content
+    dt = int((time.perf_counter() - t0) * 1000)
+    if r.status_code >= 400:
+        # only the logged prefix is decoded; the body goes back untouched
+        _log("warning", "http-error", url=str(url), status=r.status_code,
+             ms=dt, error=body[:400].decode(errors="ignore"))
+        return r.status_code, body, {}
+    _log("info", "http", url=str(url), status=r.status_code,
+         ms=dt, out_len=len(body))
+    return r.status_code, body, r.headers
+
+
+def _forward_elsewhere(raw: bytes, call_id: Optional[str]) -> None:
     if not FORWARD_URL:
         return
     # strip auth, pass a correlation id if present
     hdrs = {"Content-Type": "application/json"}
-    if "x-call-id" in headers:
-        hdrs["x-call-id"] = headers["x-call-id"]
-    st, _, _ = _post(FORWARD_URL, raw, hdrs, timeout=6.0)
+    if call_id:
+        hdrs["x-call-id"] = call_id
+    st, _, _ = _post(_FORWARD_URL, raw, hdrs, timeout=6.0)
     if st != 200 and FORWARD_RETRY:
         _log("warning", "forward failed; retrying once", status=st)
-        _post(FORWARD_URL, raw, hdrs, timeout=6.0)
+        _post(_FORWARD_URL, raw, hdrs, timeout=6.0)
+
+
+# with FORWARD_BACKGROUND, forwards run off the request thread so the Vapi ack
+# doesn't wait on the sink; the semaphore caps queued work if the sink is down
+_FWD_POOL = ThreadPoolExecutor(max_workers=FORWARD_WORKERS,
+                               thread_name_prefix="forward")
+_FWD_SLOTS = threading.BoundedSemaphore(FORWARD_MAX_INFLIGHT)
+# warn once each time the backlog climbs past this (sink slow or down)
+_FWD_BACKLOG_WARN = max(FORWARD_WORKERS * 4, 1)
+_fwd_inflight = 0
+_FWD_LOCK = threading.Lock()
+
+
+def _forward_done(fut: Future) -> None:
+    global _fwd_inflight
+    with _FWD_LOCK:
+        _fwd_inflight -= 1
+    _FWD_SLOTS.release()
+    exc = fut.exception()
+    if exc is not None:
+        _log("warning", "forward failed", error=str(exc))
+
+
+def _forward_background(raw: bytes, call_id: Optional[str]) -> None:
+    if not _FWD_SLOTS.acquire(blocking=False):
+        _log("warning", "forward dropped: too many in flight",
+             limit=FORWARD_MAX_INFLIGHT)
+        return
+    global _fwd_inflight
+    with _FWD_LOCK:
+        _fwd_inflight += 1
+        inflight = _fwd_inflight
+    if inflight == _FWD_BACKLOG_WARN:
+        _log("warning", "forward backlog growing",
+             inflight=inflight, workers=FORWARD_WORKERS)
+    _FWD_POOL.submit(_forward_elsewhere, raw, call_id).add_done_callback(
+        _forward_done)
+
+
+def _warmup() -> None:
+    """Resolve upstream hosts up front so the first event after a cold start
+    doesn't pay for DNS. Never fails import."""
+    for url in (_DYN_URL, _FORWARD_URL):
+        if url is None or not url.host:
+            continue
+        try:
+            socket.getaddrinfo(url.host, url.port or 443,
+                               type=socket.SOCK_STREAM)
+        except OSError as exc:
+            _log("warning", "warmup: dns lookup failed",
+                 host=url.host, error=str(exc))
+
+
+if os.getenv("VERCEL") or __name__ == "__main__":
+    _warmup()
+
+
+# transfer plans are identical per (mode, summary); built once and shared.
+# Nothing downstream mutates them – they are only serialised.
+_BLIND_PLAN = {"mode": "blind-transfer", "sipVerb": "refer"}
+_SUMMARY_MESSAGES = [
+    {"role": "system", "content": "Provide a concise summary of the call."},
+    {"role": "user", "content": "Here is the transcript:\n\n{{transcript}}\n\n"},
+]
+_FALLBACK_PLAN = {
+    "message": "Could not complete the transfer. I’m still here.",
+    "endCallEnabled": False,
+}
+_WARM_PLANS = {
+    enabled: {
+        "mode": "warm-transfer-experimental",
+        "summaryPlan": {"enabled": enabled, "messages": _SUMMARY_MESSAGES},
+        "fallbackPlan": _FALLBACK_PLAN,
+    }
+    for enabled in (True, False)
+}
 
 
 def _build_transfer_plan(mode: str, summary: bool = True) -> dict:
-    mode = (mode or "warm").lower()
+    # mode comes from _choose_mode, already lowercased
     if mode.startswith("blind"):
-        return {"mode": "blind-transfer", "sipVerb": "refer"}
+        return _BLIND_PLAN
     # default warm plan with summary
-    plan = {
-        "mode": "warm-transfer-experimental",
-        "summaryPlan": {
-            "enabled": bool(summary),
-            "messages": [
-                {"role": "system", "content": "Provide a concise summary of the call."},
-                {"role": "user", "content": "Here is the transcript:\n\n{{transcript}}\n\n"},
-            ],
-        },
-        "fallbackPlan": {
-            "message": "Could not complete the transfer. I’m still here.",
-            "endCallEnabled": False,
-        },
-    }
-    return plan
+    return _WARM_PLANS[bool(summary)]
+
+
+# PREFERENCES normalised once: canonical name -> (mode, callerId), defaults applied
+_DEFAULT_CLI = OUTBOUND_CLI or CLI_DEFAULT or ""
+_DEFAULT_MODE = DEFAULT_TRANSFER_MODE or "warm"
+_PREFS = {
+    name: ((p.get("mode") or _DEFAULT_MODE).lower(), p.get("callerId") or _DEFAULT_CLI)
+    for name, p in PREFERENCES.items() if isinstance(p, dict)
+}
 
 
 def _choose_cli(canonical: str) -> str:
     # per-contact override via PREFERENCES_JSON
-    pref = (PREFERENCES.get(canonical) or {})
-    return pref.get("callerId") or OUTBOUND_CLI or CLI_DEFAULT or ""
+    pref = _PREFS.get(canonical)
+    return pref[1] if pref else _DEFAULT_CLI
 
 
 def _choose_mode(canonical: str) -> str:
-    pref = (PREFERENCES.get(canonical) or {})
-    return (pref.get("mode") or DEFAULT_TRANSFER_MODE or "warm").lower()
+    pref = _PREFS.get(canonical)
+    return pref[0] if pref else _DEFAULT_MODE
 
 
 def _resolve_target(target_name: str) -> Tuple[Optional[dict], Optional[str]]:
@@ -222,44 +379,44 @@ def _resolve_target(target_name: str) -> Tuple[Optional[dict], Optional[str]]:
     key = raw.casefold()
 
     # alias normalisation
-    if ALIASES:
-        for alias, canonical in ALIASES.items():
-            if alias.casefold() == key:
-                raw = canonical
-                key = raw.casefold()
-                break
+    hit = _ALIASES_CF.get(key)
+    if hit:
+        raw = hit[1]
+        key = raw.casefold()
 
     # assistants
-    for name, asst_id in ASSISTANTS.items():
-        if name.casefold() == key:
-            _log("info", "resolve_target → assistant", name=name, id=asst_id)
-            return {
-                "type": "assistant",
-                "assistantId": asst_id,
-                "message": f"Connecting you to {name}.",
-            }, None
+    hit = _ASSISTANTS_CF.get(key)
+    if hit:
+        name, asst_id = hit
+        _log("info", "resolve_target → assistant", name=name, id=asst_id)
+        return {
+            "type": "assistant",
+            "assistantId": asst_id,
+            "message": f"Connecting you to {name}.",
+        }, None
 
     # humans (contacts)
-    for name, phone in CONTACTS.items():
-        if name.casefold() == key:
-            number = _norm_e164(phone)
-            if not number:
-                return None, f"invalid phone for {name}"
-            mode = _choose_mode(name)
-            caller_id = _choose_cli(name)
-            _log(
-                "info",
-                "resolve_target → number",
-                name=name, number=number, mode=mode, cli=caller_id
-            )
-            dest = {
-                "type": "number",
-                "number": number,
-                "callerId": caller_id or None,
-                "message": f"Transferring you to {name}. Please hold.",
-                "transferPlan": _build_transfer_plan(mode, summary=True),
-            }
-            return dest, None
+    hit = _CONTACTS_CF.get(key)
+    if hit:
+        name, phone = hit
+        number = _norm_e164(phone)
+        if not number:
+            return None, f"invalid phone for {name}"
+        mode = _choose_mode(name)
+        caller_id = _choose_cli(name)
+        _log(
+            "info",
+            "resolve_target → number",
+            name=name, number=number, mode=mode, cli=caller_id
+        )
+        dest = {
+            "type": "number",
+            "number": number,
+            "callerId": caller_id or None,
+            "message": f"Transferring you to {name}. Please hold.",
+            "transferPlan": _build_transfer_plan(mode, summary=True),
+        }
+        return dest, None
 
     return None, "no_match"
 
@@ -289,7 +446,7 @@ def _extract_args(evt: dict) -> dict:
     # phone-control forward using a name
     if evt.get("type") == "phone-call-control" and evt.get("request") == "forward":
         fwd = evt.get("forwardingPhoneNumber")
-        if fwd and re.search(r"[A-Za-z]", str(fwd)):  # looks like a name, not digits
+        if fwd and _ALPHA_RE.search(str(fwd)):  # looks like a name, not digits
             return {"targetName": str(fwd)}
 
     return {}
@@ -299,34 +456,182 @@ def _extract_args(evt: dict) -> dict:
 # ──────────────────────────────────────────────────────────────────────────────
 
 
+_COMPACT = (",", ":")  # no padding in wire JSON
+
+
 def _json_resp(code: int, payload: Dict[str, Any] | str) -> Tuple[int, list, bytes]:
     body = payload.encode() if isinstance(
-        payload, str) else json.dumps(payload).encode()
+        payload, str) else json.dumps(payload, separators=_COMPACT).encode()
     return code, [("Content-Type", "application/json")], body
 
 
+# fixed replies, encoded once
+_ACK = _json_resp(200, {"success": True})
+_UNAUTHENTICATED = _json_resp(401, {"error": "unauthenticated"})
+_INVALID_JSON = _json_resp(400, {"error": "invalid JSON"})
+_BAD_LENGTH = _json_resp(400, {"error": "invalid Content-Length"})
+_TOO_LARGE = _json_resp(413, {"error": "payload too large"})
+
+
+_Reply = Tuple[int, list, bytes]
+_HEALTHY = _json_resp(200, {"ok": True})
+
+
+# ── per-event handlers: (event, its raw bytes if on hand) -> reply, or None to
+# fall through to forward + ack
+
+def _on_healthcheck(evt: dict, evt_raw: Optional[bytes]) -> Optional[_Reply]:
+    # healthcheck for sanity testing
+    return _HEALTHY
+
+
+# tool args -> expiry of a recent resolver miss; when Vapi loops on the same
+# unresolvable request we skip the resolver round trip and resolve locally
+_RESOLVER_MISSES: "OrderedDict[str, float]" = OrderedDict()
+_RESOLVER_MISS_MAX = 1024
+_RESOLVER_LOCK = threading.Lock()
+
+
+def _resolver_missed(key: str) -> bool:
+    with _RESOLVER_LOCK:
+        exp = _RESOLVER_MISSES.get(key)
+        if exp is None:
+            return False
+        if exp > time.monotonic():
+            return True
+        del _RESOLVER_MISSES[key]
+        return False
+
+
+def _note_resolver_miss(key: str) -> None:
+    with _RESOLVER_LOCK:
+        _RESOLVER_MISSES[key] = time.monotonic() + RESOLVER_MISS_TTL
+        _RESOLVER_MISSES.move_to_end(key)
+        while len(_RESOLVER_MISSES) > _RESOLVER_MISS_MAX:
+            _RESOLVER_MISSES.popitem(last=False)
+
+
+def _on_transfer(evt: dict, evt_raw: Optional[bytes]) -> Optional[_Reply]:
+    args = _extract_args(evt)
+    miss_key: Optional[str] = None
+    if DYN_ENABLED and DYN_URL and RESOLVER_MISS_TTL > 0:
+        try:
+            miss_key = json.dumps(args, sort_keys=True, separators=_COMPACT)
+        except (TypeError, ValueError):
+            pass
+
+    # try dynamic resolver first (if enabled)
+    if miss_key is not None and _resolver_missed(miss_key):
+        _log("info", "resolver: skipped, recent miss for same args")
+    elif DYN_ENABLED and DYN_URL:
+        # forward entire event; resolver knows how to read it. A naked event
+        # is already on hand as the request bytes – only re-encode if nested
+        blob = evt_raw if evt_raw is not None else json.dumps(
+            evt, separators=_COMPACT).encode()
+        hdr = {"Content-Type": "application/json",
+               "x-vapi-secret": DYN_SECRET or ""}
+        _log("info", "resolver.call",
+             url=DYN_URL, secret=("set" if DYN_SECRET else "missing"),
+             len=len(blob))
+        st, out, _ = _post(_DYN_URL, blob, hdr, timeout=12.0)
+        if st == 200:
+            try:
+                j = json.loads(out or b"{}")
+            except Exception:
+                j = {}
+            if isinstance(j, dict) and j.get("destination"):
+                # log & return (also include legacy shim)
+                resp = _with_legacy(j)
+                _log("info", "OUT", destination=resp.get("destination"))
+                return _json_resp(200, resp)
+            _log("warning", "resolver: 200 but no destination in body")
+            # a definite answer, so remember it; transport errors are not cached
+            if miss_key is not None:
+                _note_resolver_miss(miss_key)
+        else:
+            _log("warning", "resolver: non-200", status=st)
+
+    # fallback: resolve locally from tool parameters
+    target = (args.get("targetName") or "").strip()
+    lang = (args.get("language") or "").strip().lower()
+
+    # language-only hint → route to assistant if configured
+    if not target and lang:
+        if lang in ("mt", "maltese"):
+            target = "jessemulti"
+        elif lang in ("el", "ell", "greek"):
+            target = "jessegreek"
+
+    if not target:
+        _log("warning", "no targetName in request")
+        return _json_resp(200, {"error": "no_match", "hint": "supply targetName"})
+
+    dest, err = _resolve_target(target)
+    if not dest:
+        return _json_resp(200, {"error": err or "no_match"})
+
+    resp = _with_legacy({"destination": dest})
+    _log("info", "OUT", destination=resp.get("destination"))
+    return _json_resp(200, resp)
+
+
+def _on_phone_control(evt: dict, evt_raw: Optional[bytes]) -> Optional[_Reply]:
+    # optional: intercept a rogue forward with a *name* and answer with a destination
+    if evt.get("request") != "forward":
+        return None
+    req = evt.get("forwardingPhoneNumber", "")
+    _log("info", "phone-control.forward", request=_safe_json(req))
+    # If it's a *name* not a number, try to resolve and answer with a destination anyway
+    if req and _ALPHA_RE.search(str(req)):
+        dest, err = _resolve_target(str(req))
+        if dest:
+            resp = _with_legacy({"destination": dest})
+            _log("info", "OUT (from phone-control)",
+                 destination=resp.get("destination"))
+            return _json_resp(200, resp)
+        _log("warning", "forward name not found", name=req, error=err)
+    return None
+
+
+_DISPATCH = {
+    "healthcheck": _on_healthcheck,
+    "transfer-destination-request": _on_transfer,
+    "phone-call-control": _on_phone_control,
+}
+
+
 class handler(BaseHTTPRequestHandler):  # noqa: N801
+    wbufsize = -1  # buffer status line + headers + body into one write
+
     def log_message(self, *_: Any) -> None:
         return  # silence BaseHTTPRequestHandler's default access log
 
     # core
     def do_POST(self) -> None:  # noqa: N802
-        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
-        hdrs = {k.lower(): v for k, v in self.headers.items()}
+        # refuse oversized / bogus lengths before reading, hashing or parsing
+        try:
+            clen = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            clen = -1
+        if clen < 0 or clen > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(*(_BAD_LENGTH if clen < 0 else _TOO_LARGE))
+            return
+        raw = self.rfile.read(clen)
         body_len = len(raw)
         _log("info", "request", path=self.path, body_len=body_len)
 
         # auth
-        ok, how = _auth_ok(hdrs, raw)
+        ok, how = _auth_ok(self.headers, raw)
         if not ok:
-            self._send(*_json_resp(401, {"error": "unauthenticated"}))
+            self._send(*_UNAUTHENTICATED)
             return
 
         # parse body
         try:
             data = json.loads(raw or b"{}")
         except Exception:
-            self._send(*_json_resp(400, {"error": "invalid JSON"}))
+            self._send(*_INVALID_JSON)
             return
 
         # events can be naked or nested under "message"
@@ -335,95 +640,30 @@ class handler(BaseHTTPRequestHandler):  # noqa: N801
         etype = evt.get("type")
         _log("info", "event.type="+str(etype or ""))
 
-        # healthcheck for sanity testing
-        if etype == "healthcheck":
-            self._send(*_json_resp(200, {"ok": True}))
-            return
-
-        # main: TRANSFER DESTINATION REQUEST
-        if etype == "transfer-destination-request":
-            # try dynamic resolver first (if enabled)
-            if DYN_ENABLED and DYN_URL:
-                # forward entire event; resolver knows how to read it
-                blob = json.dumps(evt).encode()
-                hdr = {"Content-Type": "application/json",
-                       "x-vapi-secret": DYN_SECRET or ""}
-                _log("info", "resolver.call",
-                     url=DYN_URL, secret=("set" if DYN_SECRET else "missing"),
-                     len=len(blob))
-                st, out, _ = _post(DYN_URL, blob, hdr, timeout=12.0)
-                if st == 200:
-                    try:
-                        j = json.loads(out or b"{}")
-                    except Exception:
-                        j = {}
-                    if isinstance(j, dict) and j.get("destination"):
-                        # log & return (also include legacy shim)
-                        resp = _with_legacy(j)
-                        _log("info", "OUT", destination=resp.get("destination"))
-                        self._send(*_json_resp(200, resp))
-                        return
-                    else:
-                        _log("warning", "resolver: 200 but no destination in body")
-                else:
-                    _log("warning", "resolver: non-200", status=st)
-
-            # fallback: resolve locally from tool parameters
-            args = _extract_args(evt)
-            target = (args.get("targetName") or "").strip()
-            lang = (args.get("language") or "").strip().lower()
-
-            # language-only hint → route to assistant if configured
-            if not target and lang:
-                if lang in ("mt", "maltese"):
-                    target = "jessemulti"
-                elif lang in ("el", "ell", "greek"):
-                    target = "jessegreek"
-
-            if not target:
-                _log("warning", "no targetName in request")
-                self._send(
-                    *_json_resp(200, {"error": "no_match", "hint": "supply targetName"}))
-                return
-
-            dest, err = _resolve_target(target)
-            if not dest:
-                self._send(*_json_resp(200, {"error": err or "no_match"}))
+        fn = _DISPATCH.get(etype) if isinstance(etype, str) else None
+        if fn is not None:
+            # raw bytes are the event itself only when it wasn't nested
+            reply = fn(evt, raw if evt is data else None)
+            if reply is not None:
+                self._send(*reply)
                 return
 
-            resp = _with_legacy({"destination": dest})
-            _log("info", "OUT", destination=resp.get("destination"))
-            self._send(*_json_resp(200, resp))
-            return
-
-        # optional: intercept a rogue forward with a *name* and answer with a destination
-        if etype == "phone-call-control" and evt.get("request") == "forward":
-            req = evt.get("forwardingPhoneNumber", "")
-            _log("info", "phone-control.forward", request=_safe_json(req))
-            # If it's a *name* not a number, try to resolve and answer with a destination anyway
-            if req and re.search(r"[A-Za-z]", str(req)):
-                dest, err = _resolve_target(str(req))
-                if dest:
-                    resp = _with_legacy({"destination": dest})
-                    _log("info", "OUT (from phone-control)",
-                         destination=resp.get("destination"))
-                    self._send(*_json_resp(200, resp))
-                    return
-                else:
-                    _log("warning", "forward name not found", name=req, error=err)
-
         # everything else: forward (optional) and ack
-        if FORWARD_URL:
-            _forward_elsewhere(raw, hdrs)
-        self._send(*_json_resp(200, {"success": True}))
+        if FORWARD_URL and FORWARD_BACKGROUND:
+            _forward_background(raw, self.headers.get("x-call-id"))
+        elif FORWARD_URL:
+            _forward_elsewhere(raw, self.headers.get("x-call-id"))
+        self._send(*_ACK)
 
     def _send(self, code: int, hdrs: list, body: bytes) -> None:
         try:
             self.send_response(code)
             for k, v in hdrs:
                 self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
             self.end_headers()
             self.wfile.write(body)
+            self.wfile.flush()
         except BrokenPipeError:
             pass
 
@@ -462,4 +702,4 @@ if __name__ == "__main__":
     _log("info", f"★ vapi_proxy listening on http://0.0.0.0:{port}",
          dyn_enabled=DYN_ENABLED, dyn_url=bool(DYN_URL),
          have_contacts=bool(CONTACTS), have_assts=bool(ASSISTANTS))
-    HTTPServer(("", port), handler).serve_forever()
+    ThreadingHTTPServer(("", port), handler).serve_forever()
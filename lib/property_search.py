@@ -20,6 +20,29 @@ WABA_PHONE_ID
 TEMPLATE_NAME           (default: send_property)
 TEMPLATE_LANG           (default: en)
 
+MONGO_MAX_POOL          (default: 10) / MONGO_MIN_POOL (default: 0)
+MONGO_MAX_IDLE_MS       (default: 300000) drop pooled sockets idle this long
+MONGO_COMPRESSORS       (optional) wire compression, e.g. zlib
+
+SKIP_INDEX_ENSURE       (default: 0) set 1 where indexes are managed elsewhere
+                        to skip the startup check. The "text_search" index is
+                        defined only here; after changing its fields/weights
+                        (or upgrading from a rex_sync-built one) run
+                        `property_search.py --reindex` once
+ATLAS_SEARCH_INDEX      (optional) name of an Atlas Search index over the
+                        text fields; text tiers then rank with $search (BM25)
+                        instead of the $text index
+
+TEXT_INDEX_BODY         (default: 1) set 0 to leave the advert bodies
+                        (internet/brochure/stocklist) out of the text index;
+                        apply with --reindex. rex_sync doesn't build the text
+                        index, so the setting sticks across sync runs
+
+LEGACY_FILTERS          (default: 1) set 0 once every doc carries rex_sync's
+                        price_sort_gbp / beds_int / baths_int /
+                        subcategory_canonical, to filter on those indexed
+                        fields instead of $or across variants
+
 Notes
 -----
 • Works with both your "old" docs and the enriched docs that include:
@@ -42,10 +65,14 @@ import math
 import os
 import re
 import sys
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from decimal import Decimal
 from difflib import get_close_matches
-from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
 
 # third-party
 import requests
@@ -53,6 +80,7 @@ from dotenv import load_dotenv
 from pymongo import ASCENDING, DESCENDING, MongoClient, TEXT
 from pymongo.collection import Collection
 from pymongo.errors import OperationFailure
+from requests.adapters import HTTPAdapter, Retry
 from requests.exceptions import HTTPError, RequestException
 
 # ─────────────────────────── setup ────────────────────────────
@@ -89,6 +117,7 @@ _LOOKUP = {
 # make direct canon keys resolve too
 for canon in list(_SUBCAT_CANON.keys()):
     _LOOKUP[canon] = canon
+_LOOKUP_KEYS = tuple(_LOOKUP)  # fuzzy-match candidates, built once
 
 _FEATURE_MAP = {
     "private garden": {"garden", "roof garden", "roof terrace", "terrace"},
@@ -101,22 +130,48 @@ _FEATURE_MAP = {
 }
 
 
+# a handful of distinct strings per run, hit once per candidate per tier
 def canonical_subcategory(val: Optional[str]) -> Optional[str]:
     if not val:
         return None
-    t = val.strip().lower()
+    # cache on the folded key, so "Flat", "flat " and "FLAT" share an entry
+    return _canonical_subcategory(val.strip().lower())
+
+
+@lru_cache(maxsize=2048)
+def _canonical_subcategory(t: str) -> Optional[str]:
     if t in _LOOKUP:
         return _LOOKUP[t]
-    hit = get_close_matches(t, list(_LOOKUP.keys()), n=1, cutoff=0.82)
+    hit = get_close_matches(t, _LOOKUP_KEYS, n=1, cutoff=0.82)
     return _LOOKUP[hit[0]] if hit else None
 
 
+# synonym/canon -> canon; first group wins, as the old per-group scan did
+_FEATURE_LOOKUP: Dict[str, str] = {}
+for canon, syns in _FEATURE_MAP.items():
+    _FEATURE_LOOKUP.setdefault(canon, canon)
+    for syn in syns:
+        _FEATURE_LOOKUP.setdefault(syn, canon)
+
+
+@lru_cache(maxsize=512)
 def norm_feature(term: str) -> str:
     t = (term or "").strip().lower()
-    for canon, syns in _FEATURE_MAP.items():
-        if t == canon or t in syns:
-            return canon
-    return t
+    return _FEATURE_LOOKUP.get(t, t)
+
+
+def _query_features(q: dict) -> Tuple[str, ...]:
+    """Normalised query features, empties and duplicates dropped (synonyms
+    like "garden"/"roof garden" collapse to one canon), in order."""
+    return tuple(dict.fromkeys(
+        f for f in (norm_feature(x) for x in (q.get("features") or []) if x) if f))
+
+
+_NON_DIGIT_RE = re.compile(r"[^\d]")
+_GBP_RE = re.compile(r"£\s*([\d,]+)")
+_DIGITS_RE = re.compile(r"([\d][\d,]{3,})")
+# UK outward code, optionally followed by (part of) the inward code
+_POSTCODE_RE = re.compile(r"^([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{0,2})?$", re.I)
 
 
 def _intish(v: Any) -> Optional[int]:
@@ -126,22 +181,55 @@ def _intish(v: Any) -> Optional[int]:
         return int(v)
     except Exception:
         s = str(v)
-        s = re.sub(r"[^\d]", "", s)
+        s = _NON_DIGIT_RE.sub("", s)
         return int(s) if s else None
 
 
 # ─────────────────────────── Settings ────────────────────────────
 @dataclass(frozen=True)
 class Settings:
+    # defaults read the env when Settings is built, not when the class is
+    # defined, so they see whatever load_dotenv/the runtime set after import
     mongodb_uri: str
-    db_name: str = os.getenv("DB_NAME", "JefferiesJames")
-    collection_name: str = os.getenv("COLLECTION_NAME", "properties")
+    db_name: str = field(default_factory=lambda: os.getenv("DB_NAME", "JefferiesJames"))
+    collection_name: str = field(
+        default_factory=lambda: os.getenv("COLLECTION_NAME", "properties"))
 
     # WhatsApp
-    waba_token: str = os.getenv("WABA_TOKEN", "")
-    waba_phone_id: str = os.getenv("WABA_PHONE_ID", "")
-    waba_template: str = os.getenv("TEMPLATE_NAME", "send_property")
-    waba_lang: str = os.getenv("TEMPLATE_LANG", "en")
+    waba_token: str = field(default_factory=lambda: os.getenv("WABA_TOKEN", ""))
+    waba_phone_id: str = field(default_factory=lambda: os.getenv("WABA_PHONE_ID", ""))
+    waba_template: str = field(
+        default_factory=lambda: os.getenv("TEMPLATE_NAME", "send_property"))
+    waba_lang: str = field(default_factory=lambda: os.getenv("TEMPLATE_LANG", "en"))
+
+    # Mongo pool: warm sockets kept per process, and how long idle ones live
+    mongo_max_pool: int = field(
+        default_factory=lambda: int(os.getenv("MONGO_MAX_POOL", "10")))
+    mongo_min_pool: int = field(
+        default_factory=lambda: int(os.getenv("MONGO_MIN_POOL", "0")))
+    mongo_max_idle_ms: int = field(
+        default_factory=lambda: int(os.getenv("MONGO_MAX_IDLE_MS", "300000")))
+    # wire compression, e.g. "zlib" ("" = off; zstd/snappy need extra packages)
+    mongo_compressors: str = field(
+        default_factory=lambda: os.getenv("MONGO_COMPRESSORS", ""))
+
+    # price/beds/baths filters: $or across legacy field variants, or the
+    # single materialised fields rex_sync writes
+    legacy_filters: bool = field(
+        default_factory=lambda: os.getenv("LEGACY_FILTERS", "1") != "0")
+
+    # check/create indexes when a repository is built
+    ensure_indexes: bool = field(
+        default_factory=lambda: os.getenv("SKIP_INDEX_ENSURE", "0") != "1")
+
+    # keep the (long) advert bodies in the text index; off = smaller index and
+    # cheaper writes, at the cost of matching words that only the body has
+    text_index_body: bool = field(
+        default_factory=lambda: os.getenv("TEXT_INDEX_BODY", "1") != "0")
+
+    # Atlas Search index for the text tiers ("" = classic $text index)
+    atlas_search_index: str = field(
+        default_factory=lambda: os.getenv("ATLAS_SEARCH_INDEX", ""))
 
     @classmethod
     def from_env(cls) -> "Settings":
@@ -157,60 +245,250 @@ class Settings:
         return f"https://graph.facebook.com/v19.0/{self.waba_phone_id}/messages"
 
 
+_REGEX_LOC_FIELDS = (
+    "display_address",
+    "address.postcode",
+    "address.formats.full_address",
+    "address.locality",
+    "address.suburb_or_town",
+    "location_terms",
+    "advert_internet.body",
+    "highlights.description",
+    "features",
+)
+
+
+@lru_cache(maxsize=256)
+def _regex_loc_or(key: str) -> dict:
+    """Case-insensitive substring $or over the location fields, built once per
+    key (the filter is only read by the driver, never mutated)."""
+    rx = {"$regex": re.escape(key), "$options": "i"}
+    return {"$or": [{f: rx} for f in _REGEX_LOC_FIELDS]}
+
+
+@lru_cache(maxsize=32)
+def _subcat_or(want: str) -> List[dict]:
+    """Type clause for _base_filter; `want` is always a canonical value, so
+    there are only a handful of these."""
+    return [
+        {"subcategory_canonical": want},
+        {"subcategories": {"$regex": want, "$options": "i"}},
+    ]
+
+
+class _RankQuery(NamedTuple):
+    """Query-side inputs to _score, read and normalised once per tier
+    instead of once per candidate."""
+    want: Optional[str]
+    feats: Tuple[str, ...]
+    purpose: Optional[str]
+    price_min: Optional[int]
+    price_max: Optional[int]
+    beds_min: Optional[int]
+    baths_min: Optional[int]
+
+
 # ───────────────────────── Repository ────────────────────────────
+# Fields _score/_has_feat read. Tiers fetch only these for their candidates;
+# find_best re-reads the full document for the winner alone.
+_RANK_FIELDS = (
+    "purpose", "subcategory_canonical", "subcategories", "updated_at",
+    # price (_price_numeric, both purposes, then display fallbacks)
+    "price_sale_gbp", "price_sort_gbp", "price_match_sale", "listing.price_match_sale",
+    "price_match", "state_value_price", "price_rent_pcm_gbp", "price_rent_amount_gbp",
+    "price_match_rent_pa_inc_tax_month", "price_display",
+    # beds / baths
+    "attributes.bedrooms", "attributes_full.bedrooms", "beds",
+    "attributes.bathrooms", "attributes_full.bathrooms", "baths",
+    # feature matching
+    "features", "highlights.description", "display_address",
+    "advert_internet.heading", "advert_internet.body",
+)
+_RANK_PROJ = {f: 1 for f in _RANK_FIELDS}
+_RANK_TEXT_PROJ = _RANK_PROJ | {"score": {"$meta": "textScore"}}
+_TEXT_SORT = [("score", {"$meta": "textScore"}), ("updated_at", DESCENDING)]
+
+# _price_numeric lookup order as (field, subfield) – split once, not per doc
+_SALE_PRICE_PATHS: Tuple[Tuple[str, Optional[str]], ...] = (
+    ("price_sale_gbp", None),
+    ("price_sort_gbp", None),
+    ("price_match_sale", None),                # legacy field from Rex
+    ("listing", "price_match_sale"),
+    ("price_match", None),
+    ("state_value_price", None),
+)
+_RENT_PRICE_PATHS: Tuple[Tuple[str, Optional[str]], ...] = (
+    ("price_rent_pcm_gbp", None),
+    ("price_rent_amount_gbp", None),
+    ("price_match_rent_pa_inc_tax_month", None),
+    ("price_match", None),
+    ("state_value_price", None),
+)
+_RANK_KEYS = ("score", "_textScore", "_rankScore")
+
+# Everything summarise() reads. Callers that only summarise the winner pass
+# this to find_best instead of pulling images/raw payloads over the wire.
+SUMMARY_PROJECTION = {f: 1 for f in (
+    "id", "address", "display_address", "size", "size_display",
+    "price_display", "price_sort_gbp", "price_sale_gbp", "price_match_sale",
+    "price_rent_pcm_gbp", "ebrochure_link", "main_image_url", "main_image",
+    "features", "highlights", "advert_internet", "subcategories",
+    "subcategory_canonical", "agents", "attributes", "attributes_full",
+    "beds", "baths",
+)}
+
+# (field, direction) single-field indexes; Mongo names them "<field>_<dir>"
+# (purpose alone is served by the compound indexes below, which lead with it)
+_SINGLE_FIELD_INDEXES = (
+    ("status", ASCENDING),
+    ("subcategory_canonical", ASCENDING),
+    ("price_sort_gbp", ASCENDING),
+    ("price_sale_gbp", ASCENDING),
+    ("price_rent_pcm_gbp", ASCENDING),
+    ("beds_int", ASCENDING),
+    ("baths_int", ASCENDING),
+    ("updated_at", DESCENDING),
+    ("address.postcode", ASCENDING),
+)
+
+# (name, keys) compound indexes, equality fields first
+_COMPOUND_INDEXES = (
+    ("purpose_subcategory", [("purpose", ASCENDING), ("subcategory_canonical", ASCENDING)]),
+    # the non-legacy numeric filters: equality on purpose/status, then ranges
+    ("purpose_status_price_beds_baths", [
+        ("purpose", ASCENDING), ("status", ASCENDING), ("price_sort_gbp", ASCENDING),
+        ("beds_int", ASCENDING), ("baths_int", ASCENDING)]),
+    # location fallback: exact term, newest first, straight off the index
+    ("location_terms_updated", [("location_terms", ASCENDING), ("updated_at", DESCENDING)]),
+)
+
+# "text_search" index fields and weights: a hit in the address outranks one
+# in the advert copy. Kept small, as the text score is added straight into
+# _score alongside the structured bonuses. This is the only definition of
+# the index – rex_sync leaves it to us.
+_TEXT_WEIGHTS = {
+    "display_address": 4,
+    "address.formats.full_address": 4,
+    "address.formats.hidden_address": 4,
+    "address.locality": 4,
+    "address.suburb_or_town": 4,
+    "address.postcode": 4,
+    "location_terms": 3,
+    "advert_internet.heading": 2,
+    "advert_brochure.heading": 2,
+    "advert_stocklist.heading": 2,
+    "highlights.description": 2,
+    "features": 2,
+    "tags": 1,
+    "subcategories": 1,
+    "advert_internet.body": 1,
+    "advert_brochure.body": 1,
+    "advert_stocklist.body": 1,
+}
+# the long free-text fields TEXT_INDEX_BODY=0 leaves out
+_TEXT_BODY_FIELDS = ("advert_internet.body", "advert_brochure.body", "advert_stocklist.body")
+# also the Atlas Search paths when enabled
+_TEXT_FIELDS = tuple(_TEXT_WEIGHTS)
+
+
+@lru_cache(maxsize=4)
+def _mongo_client(uri: str, max_pool: int, min_pool: int, max_idle_ms: int,
+                  compressors: str) -> MongoClient:
+    """One pooled client per URI + pool settings, shared by every repository
+    built in this process."""
+    return MongoClient(
+        uri,
+        tz_aware=True,
+        maxPoolSize=max_pool,
+        minPoolSize=min_pool,
+        maxIdleTimeMS=max_idle_ms,
+        serverSelectionTimeoutMS=3000,
+        connectTimeoutMS=3000,
+        socketTimeoutMS=10000,
+        retryReads=True,
+        appname="property_search",
+        **({"compressors": compressors} if compressors else {}),
+    )
+
+
 class PropertyRepository:
     """DAO + search/ranking."""
 
+    # collections whose indexes this process has already checked
+    _indexes_checked: set = set()
+
     def __init__(self, cfg: Settings):
-        self._client = MongoClient(cfg.mongodb_uri, tz_aware=True)
+        self._client = _mongo_client(cfg.mongodb_uri, cfg.mongo_max_pool, cfg.mongo_min_pool,
+                                     cfg.mongo_max_idle_ms, cfg.mongo_compressors)
         self._col: Collection = self._client[cfg.db_name][cfg.collection_name]
-        self._ensure_indexes()
+        self._legacy_filters = cfg.legacy_filters
+        self._atlas_index = cfg.atlas_search_index
+        self._text_weights = _TEXT_WEIGHTS if cfg.text_index_body else {
+            f: w for f, w in _TEXT_WEIGHTS.items() if f not in _TEXT_BODY_FIELDS}
+        ns = (cfg.mongodb_uri, cfg.db_name, cfg.collection_name)
+        if cfg.ensure_indexes and ns not in PropertyRepository._indexes_checked:
+            self._ensure_indexes()
+            PropertyRepository._indexes_checked.add(ns)
+        self._ping_at = float("-inf")
+        self._ping_ok = False
+
+    PING_TTL = 5.0  # seconds a health probe result is reused
 
     def ping(self) -> bool:
+        now = time.monotonic()
+        if now - self._ping_at < self.PING_TTL:
+            return self._ping_ok
         try:
             self._client.admin.command("ping")
-            return True
+            ok = True
         except Exception:
-            return False
+            ok = False
+        self._ping_at, self._ping_ok = now, ok
+        return ok
+
+    def _ensure_indexes(self, rebuild_text: bool = False) -> None:
+        """Create missing indexes. A text index whose field set has drifted is
+        only dropped and rebuilt when `rebuild_text` is set (the CLI's
+        --reindex); on the request path that would block searches for the
+        length of the rebuild, so it is just logged. Nothing else builds
+        "text_search" (rex_sync used to), so one --reindex after a change to
+        _TEXT_WEIGHTS settles it for good."""
+        # one list_indexes round trip; create only what's missing
+        existing = {ix["name"]: ix for ix in self._col.list_indexes()}
 
-    def _ensure_indexes(self) -> None:
         # structured fields
-        self._col.create_index([("purpose", ASCENDING)])
-        self._col.create_index([("status", ASCENDING)])
-        self._col.create_index([("subcategory_canonical", ASCENDING)])
-        self._col.create_index([("price_sort_gbp", ASCENDING)])
-        self._col.create_index([("price_sale_gbp", ASCENDING)])
-        self._col.create_index([("price_rent_pcm_gbp", ASCENDING)])
-        self._col.create_index([("updated_at", DESCENDING)])
-
-        # text index
-        text_keys = [
-            ("display_address", TEXT),
-            ("address.formats.full_address", TEXT),
-            ("address.formats.hidden_address", TEXT),
-            ("address.locality", TEXT),
-            ("address.suburb_or_town", TEXT),
-            ("address.postcode", TEXT),
-            ("advert_internet.heading", TEXT),
-            ("advert_internet.body", TEXT),
-            ("highlights.description", TEXT),
-            ("features", TEXT),
-            ("location_terms", TEXT),
-            ("tags", TEXT),
-            ("subcategories", TEXT),
-        ]
+        for field_, direction in _SINGLE_FIELD_INDEXES:
+            if f"{field_}_{direction}" not in existing:
+                self._col.create_index([(field_, direction)])
+        for name, keys in _COMPOUND_INDEXES:
+            if name not in existing:
+                self._col.create_index(keys, name=name)
+
+        # text index (recreated below if its fields or weights changed)
+        have = existing.get("text_search")
+        if have is not None and dict(have.get("weights") or {}) == self._text_weights:
+            return
+        if have is not None and not rebuild_text:
+            LOG.warning("text_search index fields/weights differ from _TEXT_WEIGHTS "
+                        "(an older spec, e.g. from a pre-change rex_sync); text tiers "
+                        "search the old fields until `property_search.py --reindex` runs")
+            return
+        text_keys = [(f, TEXT) for f in self._text_weights]
         try:
-            self._col.create_index(
-                text_keys, name="text_search", default_language="english")
+            self._col.create_index(text_keys, name="text_search",
+                                   default_language="english", weights=self._text_weights)
         except OperationFailure as exc:
-            if exc.code == 85:
+            if exc.code in (85, 86) and not rebuild_text:
+                LOG.warning("existing text index conflicts with text_search "
+                            "(%s); run with --reindex to rebuild it", exc.code)
+            elif exc.code in (85, 86):
                 # recreate if changed
                 try:
                     self._col.drop_index("text_search")
                 except Exception:
                     pass
-                self._col.create_index(
-                    text_keys, name="text_search", default_language="english")
+                self._col.create_index(text_keys, name="text_search",
+                                       default_language="english", weights=self._text_weights)
             else:
                 raise
 
@@ -220,14 +498,14 @@ class PropertyRepository:
         if not s:
             return None
         # Extract first £-number sequence
-        m = re.search(r"£\s*([\d,]+)", s)
+        m = _GBP_RE.search(s)
         if m:
             try:
                 return int(m.group(1).replace(",", ""))
             except Exception:
                 return None
         # fall back: any digits number
-        m = re.search(r"([\d][\d,]{3,})", s)
+        m = _DIGITS_RE.search(s)
         if m:
             try:
                 return int(m.group(1).replace(",", ""))
@@ -237,33 +515,11 @@ class PropertyRepository:
 
     def _price_numeric(self, doc: dict, purpose: Optional[str]) -> Optional[int]:
         """Prefer explicit numeric fields; fallback to parsing formatted strings."""
-        # Sale-first order, rental-first order
-        keys_sale = (
-            "price_sale_gbp",
-            "price_sort_gbp",
-            "price_match_sale",                # legacy field from Rex
-            "listing.price_match_sale",
-            "price_match",
-            "state_value_price",
-        )
-        keys_rent = (
-            "price_rent_pcm_gbp",
-            "price_rent_amount_gbp",
-            "price_match_rent_pa_inc_tax_month",
-            "price_match",
-            "state_value_price",
-        )
-        keys = keys_rent if (purpose == "rental") else keys_sale
-
-        def _get(d: dict, dotted: str) -> Any:
-            if "." not in dotted:
-                return d.get(dotted)
-            a, b = dotted.split(".", 1)
-            sub = d.get(a) or {}
-            return sub.get(b) if isinstance(sub, dict) else None
-
-        for k in keys:
-            v = _get(doc, k)
+        # Sale-first order, rental-first order (paths pre-split at import)
+        for top, sub in (_RENT_PRICE_PATHS if purpose == "rental" else _SALE_PRICE_PATHS):
+            v = doc.get(top)
+            if sub is not None:
+                v = v.get(sub) if isinstance(v, dict) else None
             iv = _intish(v)
             if iv:
                 return iv
@@ -299,34 +555,59 @@ class PropertyRepository:
         return _intish(doc.get("baths"))
 
     @staticmethod
-    def _has_feat(doc: dict, feat: str) -> bool:
+    def _feat_haystack(doc: dict) -> Tuple[Tuple[str, ...], Tuple[str, ...], str]:
+        """Lowercased features / highlights / marketing text, built once per doc
+        and stashed on it, rather than once per (doc, feature) pair."""
+        hs = doc.get("_featHaystack")
+        if hs is None:
+            feats = tuple(f.lower() for f in (doc.get("features") or [])
+                          if isinstance(f, str))
+            highs = tuple((h.get("description") or "").lower()
+                          for h in (doc.get("highlights") or []) if isinstance(h, dict))
+            advert = doc.get("advert_internet") or {}
+            txt = " ".join([
+                (doc.get("display_address") or ""),
+                (advert.get("heading") or ""),
+                (advert.get("body") or ""),
+            ]).lower()
+            hs = doc["_featHaystack"] = (feats, highs, txt)
+        return hs
+
+    @classmethod
+    def _has_feat(cls, doc: dict, feat: str) -> bool:
         feat = feat.lower()
-        # features array
-        for f in (doc.get("features") or []):
-            if isinstance(f, str) and feat in f.lower():
-                return True
-        # highlights
-        for h in (doc.get("highlights") or []):
-            if isinstance(h, dict) and feat in (h.get("description", "").lower()):
-                return True
-        # marketing text
-        txt = " ".join([
-            (doc.get("display_address") or ""),
-            (doc.get("advert_internet", {}).get("heading") or ""),
-            (doc.get("advert_internet", {}).get("body") or ""),
-        ]).lower()
-        return feat in txt
+        feats, highs, txt = cls._feat_haystack(doc)
+        # features array, then highlights, then marketing text
+        return (any(feat in f for f in feats)
+                or any(feat in h for h in highs)
+                or feat in txt)
 
     # ---------- scoring ----------
-    def _score(self, doc: dict, q: dict, text_score: float = 0.0) -> float:
+    @staticmethod
+    def _rank_query(q: dict) -> _RankQuery:
+        return _RankQuery(
+            want=canonical_subcategory(
+                q.get("subcategory") or q.get("subcategory_canonical") or ""),
+            feats=_query_features(q),
+            purpose=q.get("purpose"),
+            price_min=q.get("price_min"),
+            price_max=q.get("price_max"),
+            beds_min=q.get("beds_min"),
+            baths_min=q.get("baths_min"),
+        )
+
+    def _score(self, doc: dict, q: dict, text_score: float = 0.0, *,
+               rq: Optional[_RankQuery] = None) -> float:
+        """`rq` is the query side, normalised once; callers ranking many docs pass it in."""
+        if rq is None:
+            rq = self._rank_query(q)
         score = 0.0
 
         # 1) text relevance
         score += 1.0 * float(text_score or 0.0)
 
         # 2) subcategory
-        want = canonical_subcategory(
-            q.get("subcategory") or q.get("subcategory_canonical") or "")
+        want = rq.want
         have = doc.get("subcategory_canonical")
         if not have:
             # attempt from subcategories list
@@ -344,12 +625,13 @@ class PropertyRepository:
                 score -= 0.75
 
         # 3) purpose hard filter was applied, but missing data gets small penalty
-        if q.get("purpose") and doc.get("purpose") and doc.get("purpose") != q.get("purpose"):
+        purpose = doc.get("purpose")
+        if rq.purpose and purpose and purpose != rq.purpose:
             score -= 2.0
 
         # 4) price closeness (midpoint in range)
-        pmin, pmax = q.get("price_min"), q.get("price_max")
-        price = self._price_numeric(doc, q.get("purpose"))
+        pmin, pmax = rq.price_min, rq.price_max
+        price = self._price_numeric(doc, rq.purpose)
         if price:
             if pmin or pmax:
                 lo = pmin or price
@@ -364,7 +646,7 @@ class PropertyRepository:
                 score += 0.25  # slight bump for known price
 
         # 5) beds/baths
-        want_beds, want_baths = q.get("beds_min"), q.get("baths_min")
+        want_beds, want_baths = rq.beds_min, rq.baths_min
         b = self._beds(doc)
         if want_beds:
             if b is None:
@@ -384,7 +666,7 @@ class PropertyRepository:
                 score += min(1.7, 0.5 + 0.2 * (ba - want_baths))
 
         # 6) features coverage
-        feats = [norm_feature(x) for x in (q.get("features") or []) if x]
+        feats = rq.feats
         if feats:
             hits = sum(1 for f in feats if self._has_feat(doc, f))
             score += min(1.5, 0.5 * hits)
@@ -406,6 +688,12 @@ class PropertyRepository:
         if pmax is not None:
             bounds["$lte"] = pmax
 
+        if not self._legacy_filters:
+            # rex_sync materialises price_sort_gbp (sale price, or rent pcm)
+            # on every doc: one indexed range instead of an $or whose
+            # unindexed legacy branches force a collection scan
+            return {"price_sort_gbp": bounds}
+
         if purpose == "rental":
             keys = ["price_rent_pcm_gbp", "price_match_rent_pa_inc_tax_month"]
         else:
@@ -417,6 +705,8 @@ class PropertyRepository:
     def _beds_filter_or(self, min_v: Optional[int]) -> Optional[dict]:
         if not min_v:
             return None
+        if not self._legacy_filters:
+            return {"beds_int": {"$gte": min_v}}
         # handle ints or strings "5","6",...
         str_candidates = [str(i) for i in range(min_v, 21)]
         return {"$or": [
@@ -430,6 +720,8 @@ class PropertyRepository:
     def _baths_filter_or(self, min_v: Optional[int]) -> Optional[dict]:
         if not min_v:
             return None
+        if not self._legacy_filters:
+            return {"baths_int": {"$gte": min_v}}
         str_candidates = [str(i) for i in range(min_v, 21)]
         return {"$or": [
             {"attributes.bathrooms": {"$gte": min_v}},
@@ -449,89 +741,139 @@ class PropertyRepository:
         if include_type:
             want = canonical_subcategory(
                 q.get("subcategory") or q.get("subcategory_canonical"))
-            if want:
-                f["$or"] = [
-                    {"subcategory_canonical": want},
-                    {"subcategories": {"$regex": want, "$options": "i"}},
-                ]
+            if want and not self._legacy_filters:
+                f["subcategory_canonical"] = want
+            elif want:
+                f["$or"] = _subcat_or(want)
         return f
 
     def _text_terms(self, q: dict) -> str:
         key = (q.get("location") or q.get("keyword") or "").strip()
-        feats = [norm_feature(x) for x in (q.get("features") or []) if x]
-        parts = [key, *feats]
+        parts = [key, *_query_features(q)]
         return " ".join([p for p in parts if p]).strip()
 
-    def _run_tier(self, q: dict, tier_name: str, text: bool, apply_price=True, apply_beds=True, limit=40) -> List[dict]:
-        base = self._base_filter(q, include_type=True)
-
-        # structured filters
-        and_terms: List[dict] = []
-        pf = self._price_filter_or(q.get("purpose"), q.get(
-            "price_min"), q.get("price_max")) if apply_price else None
-        if pf:
-            and_terms.append(pf)
-
-        bf = self._beds_filter_or(q.get("beds_min")) if apply_beds else None
-        if bf:
-            and_terms.append(bf)
+    def _tier_filters(self, q: dict) -> Tuple[dict, Optional[dict], Optional[dict], Optional[dict]]:
+        """(base, price, beds, baths) filters – identical across tiers, so
+        find_best builds them once; tiers only choose which to apply."""
+        return (
+            self._base_filter(q, include_type=True),
+            self._price_filter_or(q.get("purpose"), q.get(
+                "price_min"), q.get("price_max")),
+            self._beds_filter_or(q.get("beds_min")),
+            self._baths_filter_or(q.get("baths_min")),
+        )
 
-        baf = self._baths_filter_or(q.get("baths_min")) if apply_beds else None
-        if baf:
-            and_terms.append(baf)
+    def _run_tier(self, q: dict, tier_name: str, text: bool, apply_price=True, apply_beds=True, limit=40,
+                  terms: Optional[str] = None,
+                  filters: Optional[Tuple[dict, Optional[dict], Optional[dict], Optional[dict]]] = None) -> List[dict]:
+        base, pf, bf, baf = filters if filters is not None else self._tier_filters(q)
 
+        # structured filters
+        and_terms: List[dict] = [
+            f for f, on in ((pf, apply_price), (bf, apply_beds), (baf, apply_beds))
+            if on and f
+        ]
         if and_terms:
             base = {"$and": [base, *and_terms]}
-        LOG.debug("tier %s base=%s", tier_name, json.dumps(base))
+        if LOG.isEnabledFor(logging.DEBUG):  # don't serialise the filter just to drop it
+            LOG.debug("tier %s base=%s", tier_name, json.dumps(base, default=str))
 
         docs: List[dict] = []
         if text:
-            terms = self._text_terms(q)
+            if terms is None:
+                terms = self._text_terms(q)
             if not terms:
                 return []
-            cur = (self._col.find(base | {"$text": {"$search": terms}},
-                                  {"score": {"$meta": "textScore"}})
-                   .sort([("score", {"$meta": "textScore"}), ("updated_at", DESCENDING)])
-                   .limit(limit))
+            if self._atlas_index:
+                # BM25 top-k from Lucene; $search output is already score-ordered
+                cur = self._col.aggregate([
+                    {"$search": {"index": self._atlas_index,
+                                 "text": {"query": terms, "path": list(_TEXT_FIELDS)}}},
+                    {"$match": base},
+                    {"$limit": limit},
+                    {"$project": _RANK_PROJ | {"score": {"$meta": "searchScore"}}},
+                ], batchSize=limit)
+            else:
+                cur = (self._col.find(base | {"$text": {"$search": terms}}, _RANK_TEXT_PROJ)
+                       .sort(_TEXT_SORT)
+                       .limit(limit)
+                       .batch_size(limit))  # one batch; no hint – $text forbids it
             for d in cur:
                 d["_textScore"] = float(d.get("score", 0.0))  # stash
                 docs.append(d)
         else:
-            # regex location fallback
+            # location fallback, cheapest first: exact hit on rex_sync's
+            # lower-cased location_terms (postcode/outward/sector, locality,
+            # town, street), a phrase match ($search when Atlas Search is
+            # configured, else the text index), an anchored postcode prefix,
+            # and the nine-field regex scan only if none of those finds anything
             key = (q.get("location") or q.get("keyword") or "").strip()
             if key:
-                rx = {"$regex": re.escape(key), "$options": "i"}
-                loc_or = {
-                    "$or": [
-                        {"display_address": rx},
-                        {"address.postcode": rx},
-                        {"address.formats.full_address": rx},
-                        {"address.locality": rx},
-                        {"address.suburb_or_town": rx},
-                        {"location_terms": rx},
-                        {"advert_internet.body": rx},
-                        {"highlights.description": rx},
-                        {"features": rx},
-                    ]
-                }
-                base = {"$and": [base, loc_or]}
-            cur = self._col.find(base).sort(
-                [("updated_at", DESCENDING)]).limit(limit)
-            docs = list(cur)
-
-        # rank
+                docs = list(self._col.find(
+                    base | {"location_terms": " ".join(key.lower().split())}, _RANK_PROJ)
+                    .sort([("updated_at", DESCENDING)])
+                    .limit(limit)
+                    .batch_size(limit))
+            if docs or not key:
+                pass
+            elif self._atlas_index:
+                docs = list(self._col.aggregate([
+                    {"$search": {"index": self._atlas_index,
+                                 "phrase": {"query": key, "path": list(_TEXT_FIELDS)}}},
+                    {"$match": base},
+                    {"$limit": limit},
+                    {"$project": _RANK_PROJ},
+                ], batchSize=limit))
+            else:
+                phrase = '"' + key.replace('"', " ") + '"'
+                docs = list(self._col.find(base | {"$text": {"$search": phrase}}, _RANK_TEXT_PROJ)
+                            .sort(_TEXT_SORT)
+                            .limit(limit)
+                            .batch_size(limit))
+            m = _POSTCODE_RE.match(key) if key and not docs else None
+            if m:
+                # postcodes are stored upper-case as "OUT IN"; a case-sensitive
+                # ^prefix regex is a bounded scan of the address.postcode index
+                # (a bare outward code must not run on into a longer one: SW1 ≠ SW10)
+                out, inward = m.group(1).upper(), m.group(2)
+                rx = "^" + (re.escape(f"{out} {inward.upper()}") if inward
+                            else re.escape(out) + r"(?!\d)")
+                docs = list(self._col.find(
+                    base | {"address.postcode": {"$regex": rx}},
+                    _RANK_PROJ)
+                    .sort([("updated_at", DESCENDING)])
+                    .limit(limit)
+                    .batch_size(limit))
+            if not docs:
+                if key:
+                    base = {"$and": [base, _regex_loc_or(key)]}
+                # no hint: updated_at_-1 may not exist (SKIP_INDEX_ENSURE, CLI),
+                # and the planner can still pick purpose_subcategory when the
+                # equality filters are selective; the limit bounds the sort
+                cur = (self._col.find(base, _RANK_PROJ)
+                       .sort([("updated_at", DESCENDING)])
+                       .limit(limit)
+                       .batch_size(limit))
+                docs = list(cur)
+
+        # rank – query-side normalisation hoisted out of the per-doc loop
+        rq = self._rank_query(q)
         for d in docs:
             ts = float(d.get("_textScore", 0.0)) if text else 0.0
-            d["_rankScore"] = self._score(d, q, ts)
+            d["_rankScore"] = self._score(d, q, ts, rq=rq)
 
         docs.sort(key=lambda x: x.get("_rankScore", 0.0), reverse=True)
         return docs
 
     # ---------- public: find_best ----------
-    def find_best(self, query: Dict[str, Any]) -> Tuple[Optional[dict], str, Dict[str, Any]]:
+    def find_best(self, query: Dict[str, Any], projection: Optional[dict] = None
+                  ) -> Tuple[Optional[dict], str, Dict[str, Any]]:
         """
         Try strict text + filters; then relax price, then relax beds/baths,
         then regex location. Return (doc, tier, debug).
+
+        `projection` limits the fields of the returned doc (e.g.
+        SUMMARY_PROJECTION); by default the full record comes back.
         """
         q = dict(query or {})
         # unify location/keyword
@@ -541,8 +883,9 @@ class PropertyRepository:
         # quick exact id
         for key in ("listing_id", "_id", "id"):
             if q.get(key):
+                v = str(q[key])
                 doc = self._col.find_one(
-                    {"_id": str(q[key])}) or self._col.find_one({"id": str(q[key])})
+                    {"$or": [{"_id": v}, {"id": v}]}, projection)
                 if doc:
                     return doc, "id_exact", {"candidates": 1}
 
@@ -552,26 +895,96 @@ class PropertyRepository:
             ("text_no_beds",    dict(text=True,  apply_price=True,  apply_beds=False)),
             ("regex_fallback",  dict(text=False, apply_price=False, apply_beds=False)),
         ]
+        # text tiers can't match without terms – skip them and go straight to
+        # the regex fallback
+        terms = self._text_terms(q)
+        filters = self._tier_filters(q)
+        _, pf, bf, baf = filters
+        seen = set()
         debug: Dict[str, Any] = {}
         for name, params in tiers:
-            docs = self._run_tier(q, name, **params)
+            # a relaxed tier that drops a filter the query never had is the
+            # same query as an earlier (empty) tier – don't send it again
+            sig = (params["text"],
+                   params["apply_price"] and pf is not None,
+                   params["apply_beds"] and (bf is not None or baf is not None))
+            if (params["text"] and not terms) or sig in seen:
+                debug[name] = []
+                continue
+            seen.add(sig)
+            docs = self._run_tier(q, name, terms=terms, filters=filters, **params)
             debug[name] = [{"_id": d.get("_id"), "score": round(
                 d.get("_rankScore", 0.0), 3)} for d in docs[:5]]
             if docs:
-                return docs[0], name, debug
+                return self._full_doc(docs[0], projection), name, debug
         return None, "none", debug
 
+    def _full_doc(self, ranked: dict, projection: Optional[dict] = None) -> dict:
+        """Full record for a projected winner, keeping its ranking stash."""
+        doc = self._col.find_one({"_id": ranked["_id"]}, projection)
+        if not doc:  # vanished between queries – best we have
+            return ranked
+        for k in _RANK_KEYS:
+            if k in ranked:
+                doc[k] = ranked[k]
+        return doc
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Settings.from_env(), read once per process."""
+    return Settings.from_env()
+
+
+_REPO: Optional[PropertyRepository] = None
+_REPO_LOCK = threading.Lock()
+
+
+def get_repository(cfg: Optional[Settings] = None) -> PropertyRepository:
+    """Process-wide repository, so every caller shares one MongoClient pool.
+    The first call's settings win; later `cfg` arguments are ignored."""
+    global _REPO
+    if _REPO is None:
+        with _REPO_LOCK:
+            if _REPO is None:
+                _REPO = PropertyRepository(cfg or get_settings())
+    return _REPO
+
 
 # ───────────────────── WhatsApp sender ─────────────────────
 def _nz(v: Optional[str]) -> str:
     return str(v) if v not in (None, "", "None") else "-"
 
 
-def send_whatsapp(cfg: Settings, phone: str, summary: Dict[str, Any]) -> None:
-    headers = {
-        "Authorization": f"Bearer {cfg.waba_token}",
+def _waba_session() -> requests.Session:
+    """Keep-alive pool to graph.facebook.com shared by every send.
+
+    Only failures where Meta can't have accepted the message are retried –
+    connect errors and 429s – so a slow 5xx never double-sends."""
+    retry = Retry(total=2, connect=2, read=0, status=2, backoff_factor=0.2,
+                  status_forcelist=(429,), allowed_methods=frozenset({"POST"}),
+                  raise_on_status=False)
+    sess = requests.Session()
+    sess.mount("https://", HTTPAdapter(
+        pool_connections=4, pool_maxsize=16, max_retries=retry))
+    return sess
+
+
+_WABA_HTTP = _waba_session()
+_COMPACT = (",", ":")  # no padding in wire JSON
+
+
+@lru_cache(maxsize=4)
+def _waba_headers(token: str) -> Dict[str, str]:
+    # shared between sends; requests copies it into each request, never mutates
+    return {
+        "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
     }
+
+
+def _waba_template(cfg: Settings, summary: Dict[str, Any]) -> Dict[str, Any]:
+    """The recipient-independent "template" part of a send."""
     # Map to your template variables (keep these names stable!)
     body_params = [
         {"type": "text", "parameter_name": "location",
@@ -585,22 +998,31 @@ def send_whatsapp(cfg: Settings, phone: str, summary: Dict[str, Any]) -> None:
         {"type": "text", "parameter_name": "size",
             "text": _nz(summary.get("size"))},
     ]
+    return {
+        "name": cfg.waba_template,
+        "language": {"code": cfg.waba_lang, "policy": "deterministic"},
+        "components": [
+            {"type": "body", "parameters": body_params},
+            {"type": "button", "sub_type": "url", "index": "0",
+             "parameters": [{"type": "text", "text": summary["listing_id"]}]},
+        ],
+    }
+
+
+def _waba_body(phone: str, template: Dict[str, Any]) -> bytes:
     payload = {
         "messaging_product": "whatsapp",
         "to": phone,
         "type": "template",
-        "template": {
-            "name": cfg.waba_template,
-            "language": {"code": cfg.waba_lang, "policy": "deterministic"},
-            "components": [
-                {"type": "body", "parameters": body_params},
-                {"type": "button", "sub_type": "url", "index": "0",
-                 "parameters": [{"type": "text", "text": summary["listing_id"]}]},
-            ],
-        },
+        "template": template,
     }
-    r = requests.post(cfg.waba_endpoint, headers=headers,
-                      json=payload, timeout=12)
+    # encoded here, compact and as bytes, rather than via requests' json=
+    return json.dumps(payload, separators=_COMPACT, ensure_ascii=False).encode()
+
+
+def _waba_post(cfg: Settings, data: bytes) -> None:
+    r = _WABA_HTTP.post(cfg.waba_endpoint, headers=_waba_headers(cfg.waba_token),
+                        data=data, timeout=12)
     try:
         r.raise_for_status()
     except HTTPError:
@@ -611,85 +1033,136 @@ def send_whatsapp(cfg: Settings, phone: str, summary: Dict[str, Any]) -> None:
         raise
 
 
+def _waba_post_many(cfg: Settings, bodies: List[bytes],
+                    max_workers: int = 8) -> List[Optional[Exception]]:
+    """Post pre-encoded sends concurrently over the shared session. Returns,
+    per body and in order, None or the exception it raised."""
+    def one(data: bytes) -> Optional[Exception]:
+        try:
+            _waba_post(cfg, data)
+            return None
+        except Exception as exc:
+            return exc
+
+    if len(bodies) < 2:
+        return [one(b) for b in bodies]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(bodies))) as ex:
+        return list(ex.map(one, bodies))
+
+
+def send_whatsapp(cfg: Settings, phone: str, summary: Dict[str, Any]) -> None:
+    _waba_post(cfg, _waba_body(phone, _waba_template(cfg, summary)))
+
+
+def send_whatsapp_bulk(cfg: Settings, items: List[Tuple[str, Dict[str, Any]]],
+                       max_workers: int = 8) -> List[Optional[Exception]]:
+    """send_whatsapp for several (phone, summary) pairs at once over the shared
+    session. Returns, per item and in order, None or the exception it raised."""
+    return _waba_post_many(
+        cfg, [_waba_body(phone, _waba_template(cfg, summary)) for phone, summary in items],
+        max_workers)
+
+
+def send_whatsapp_many(cfg: Settings, phones: List[str], summary: Dict[str, Any],
+                       max_workers: int = 8) -> List[Optional[Exception]]:
+    """One summary to several recipients; the template is built once."""
+    template = _waba_template(cfg, summary)
+    return _waba_post_many(cfg, [_waba_body(p, template) for p in phones], max_workers)
+
+
 # ───────────────────── summary builder ─────────────────────
+_HOUSE_NUMBER_RE = re.compile(r"^\s*\d+\s*")
+
+
 def _strip_house_number(a: str) -> str:
-    return re.sub(r"^\s*\d+\s*", "", a).strip()
+    return _HOUSE_NUMBER_RE.sub("", a).strip()
 
 
 def _pick_main_image(rec: Dict[str, Any]) -> str:
     return rec.get("main_image_url") or rec.get("main_image") or ""
 
 
-def summarise(rec: Dict[str, Any]) -> Dict[str, Any]:
-    addr = rec.get("address") or {}
-    addr_fmt = addr.get("formats") or {}
-    safe_addr = addr_fmt.get("hidden_address") or _strip_house_number(
-        rec.get("display_address", "")) or rec.get("display_address", "")
+def summarise(rec: Dict[str, Any], fields: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """WhatsApp/Vapi summary of a listing. `fields` limits it to those keys
+    (the others are not computed at all); default is every key."""
+    def want(k: str) -> bool:
+        return fields is None or k in fields
 
-    # price (prefer numeric -> format; else display text)
-    def fmt_gbp(v: Optional[int]) -> Optional[str]:
-        if v is None:
-            return None
-        return f"£{v:,}"
-
-    # choose best available price text
-    price_text = rec.get("price_display") or fmt_gbp(
-        rec.get("price_sort_gbp") or rec.get("price_sale_gbp"))
-    if not price_text:
-        price_text = fmt_gbp(rec.get("price_match_sale")) or fmt_gbp(
-            rec.get("price_rent_pcm_gbp"))
-
-    # canonical subcategory
-    canon = rec.get("subcategory_canonical")
-    if not canon:
-        for s in rec.get("subcategories") or []:
-            cs = canonical_subcategory(str(s))
-            if cs:
-                canon = cs
-                break
-
-    # agent
-    agents = rec.get("agents") or []
-    ag = agents[0] if agents else None
-    agent_details = {
-        "id": (ag or {}).get("id"),
-        "name": (ag or {}).get("name"),
-        "email": (ag or {}).get("email"),
-        "phone_mobile": (ag or {}).get("phone_mobile"),
-        "phone_direct": (ag or {}).get("phone_direct"),
-        "position": (ag or {}).get("position"),
-        "profile_image_url": (ag or {}).get("profile_image_url") or "",
-    } if ag else None
-
-    # amenities
-    am = rec.get("attributes") or rec.get("attributes_full") or {}
-    beds = am.get("bedrooms") or rec.get("beds")
-    baths = am.get("bathrooms") or rec.get("baths")
+    out: Dict[str, Any] = {}
+    addr = rec.get("address") or {}
 
-    return {
-        "listing_id": str(rec.get("_id") or rec.get("id")),
-        "address": safe_addr,
-        "size": rec.get("size_display") or rec.get("size"),
-        "price": price_text,
-        "ebrochure_url": rec.get("ebrochure_link") or f"{EBROCHURE_BASE}{rec.get('_id')}",
-        "main_image_url": _pick_main_image(rec),
-        "location": {
+    if want("listing_id"):
+        out["listing_id"] = str(rec.get("_id") or rec.get("id"))
+    if want("address"):
+        addr_fmt = addr.get("formats") or {}
+        out["address"] = addr_fmt.get("hidden_address") or _strip_house_number(
+            rec.get("display_address", "")) or rec.get("display_address", "")
+    if want("size"):
+        out["size"] = rec.get("size_display") or rec.get("size")
+
+    if want("price"):
+        # price (prefer numeric -> format; else display text)
+        def fmt_gbp(v: Optional[int]) -> Optional[str]:
+            if v is None:
+                return None
+            return f"£{v:,}"
+
+        # choose best available price text
+        price_text = rec.get("price_display") or fmt_gbp(
+            rec.get("price_sort_gbp") or rec.get("price_sale_gbp"))
+        if not price_text:
+            price_text = fmt_gbp(rec.get("price_match_sale")) or fmt_gbp(
+                rec.get("price_rent_pcm_gbp"))
+        out["price"] = price_text
+
+    if want("ebrochure_url"):
+        out["ebrochure_url"] = rec.get("ebrochure_link") or f"{EBROCHURE_BASE}{rec.get('_id')}"
+    if want("main_image_url"):
+        out["main_image_url"] = _pick_main_image(rec)
+    if want("location"):
+        out["location"] = {
             "postcode": addr.get("postcode"),
             "locality": addr.get("locality"),
             "suburb_or_town": addr.get("suburb_or_town"),
             "latitude": addr.get("lat") or addr.get("latitude"),
             "longitude": addr.get("lon") or addr.get("longitude"),
-        },
-        "features": rec.get("features") or [],
-        "highlights": ", ".join([h.get("description") for h in (rec.get("highlights") or []) if isinstance(h, dict) and h.get("description")]),
-        "marketing": {
+        }
+    if want("features"):
+        out["features"] = rec.get("features") or []
+    if want("highlights"):
+        out["highlights"] = ", ".join([h.get("description") for h in (rec.get("highlights") or []) if isinstance(h, dict) and h.get("description")])
+    if want("marketing"):
+        out["marketing"] = {
             "heading": (rec.get("advert_internet") or {}).get("heading"),
             "body": (rec.get("advert_internet") or {}).get("body"),
-        },
-        "amenities": {"beds": str(beds) if beds is not None else None, "baths": str(baths) if baths is not None else None},
-        "subcategory": canon,
-        "agent": agent_details,
-    }
+        }
+
+    if want("amenities"):
+        am = rec.get("attributes") or rec.get("attributes_full") or {}
+        beds = am.get("bedrooms") or rec.get("beds")
+        baths = am.get("bathrooms") or rec.get("baths")
+        out["amenities"] = {"beds": str(beds) if beds is not None else None, "baths": str(baths) if baths is not None else None}
+
+    if want("subcategory"):
+        # canonical subcategory
+        out["subcategory"] = rec.get("subcategory_canonical") or next(
+            (c for c in map(canonical_subcategory, map(str, rec.get("subcategories") or [])) if c),
+            None)
+
+    if want("agent"):
+        agents = rec.get("agents") or []
+        ag = agents[0] if agents else None
+        out["agent"] = {
+            "id": (ag or {}).get("id"),
+            "name": (ag or {}).get("name"),
+            "email": (ag or {}).get("email"),
+            "phone_mobile": (ag or {}).get("phone_mobile"),
+            "phone_direct": (ag or {}).get("phone_direct"),
+            "position": (ag or {}).get("position"),
+            "profile_image_url": (ag or {}).get("profile_image_url") or "",
+        } if ag else None
+
+    return out
 
 
 # ───────────────────── CLI helpers ─────────────────────
@@ -704,6 +1177,10 @@ def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     p.add_argument("--to", help="Destination MSISDN (e.g. 27764121438)")
     p.add_argument("--dry", action="store_true",
                    help="Skip WhatsApp send (print only)")
+    p.add_argument("--fields",
+                   help="Comma-separated summary keys to print (e.g. listing_id,price)")
+    p.add_argument("--reindex", action="store_true",
+                   help="Create missing indexes, rebuilding a changed text index, then exit")
     return p.parse_args(argv)
 
 
@@ -720,23 +1197,34 @@ def _build_query(ns: argparse.Namespace) -> Dict[str, Any]:
 
 
 def main(argv: Optional[List[str]] = None) -> None:
-    cfg = Settings.from_env()
-    repo = PropertyRepository(cfg)
-
+    cfg = get_settings()
     ns = _parse_args(argv)
+    if ns.reindex:
+        PropertyRepository(replace(cfg, ensure_indexes=False))._ensure_indexes(
+            rebuild_text=True)
+        print("indexes ensured")
+        return
+
+    # a one-shot CLI run shouldn't pay the index probe; --reindex does that
+    repo = get_repository(replace(cfg, ensure_indexes=False))
     q = _build_query(ns)
 
-    doc, tier, debug = repo.find_best(q)
+    doc, tier, debug = repo.find_best(q, SUMMARY_PROJECTION)
     if not doc:
         print(json.dumps(
             {"no_match": True, "tier": tier, "debug": debug}, indent=2))
         sys.exit(4)
 
-    summary = summarise(doc)
+    fields = {f.strip() for f in ns.fields.split(",") if f.strip()} if ns.fields else None
+    # a WhatsApp send needs the full summary; otherwise build only what's asked
+    sending = bool(ns.to and not ns.dry)
+    summary = summarise(doc, None if sending else fields)
     summary["tier"] = tier
-    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    shown = summary if fields is None else {
+        k: v for k, v in summary.items() if k in fields or k == "tier"}
+    print(json.dumps(shown, indent=2, ensure_ascii=False))
 
-    if ns.to and not ns.dry:
+    if sending:
         try:
             send_whatsapp(cfg, ns.to, summary)
             print(f"WhatsApp template '{cfg.waba_template}' sent to {ns.to}")